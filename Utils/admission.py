@@ -0,0 +1,161 @@
+import os
+import threading
+import time
+from collections import Counter, deque
+from dataclasses import dataclass
+
+from PIL import Image
+
+from Utils.ingest import read_header
+
+# Upload admission control.
+# Every upload is checked before any pixels are decoded: byte size first,
+# then format and dimensions from the image header (Image.open only parses
+# the header). Oversized JPEGs can be admitted at a reduced decode size,
+# since draft mode decodes them at 1/2, 1/4 or 1/8 scale without building
+# the full bitmap; other oversized images are rejected because shrinking
+# them would need a full decode. A per-session sliding-window limit caps
+# how many files one session can push through the models.
+#
+#   TUMORX_MAX_UPLOAD_MB        largest accepted file (default: 20)
+#   TUMORX_MAX_PIXELS           largest accepted width x height (default: 40000000)
+#   TUMORX_OVERSIZE_ACTION      "downscale" (default) or "reject" above max pixels
+#   TUMORX_UPLOAD_FORMATS       comma-separated formats by header (default: JPEG,PNG)
+#   TUMORX_RATE_LIMIT           files per session per window, 0 = off (default: 120)
+#   TUMORX_RATE_WINDOW_S        rate-limit window in seconds (default: 60)
+
+MAX_DRAFT_SCALE = 8
+
+
+@dataclass
+class Admission:
+    upload: object
+    format: str = None
+    size: tuple = None
+    mode: str = None
+    max_side: int = None     # decode bound for downscaled uploads, else None
+    code: str = None         # rejection category; None when admitted
+    reason: str = None
+
+    @property
+    def ok(self):
+        return self.code is None
+
+    @property
+    def downscaled(self):
+        return self.max_side is not None
+
+
+class AdmissionPolicy:
+    def __init__(self, max_bytes=20 * 1024 * 1024, max_pixels=40_000_000, oversize="downscale",
+                 formats=("JPEG", "PNG"), rate_limit=120, rate_window=60.0):
+        self.max_bytes = max_bytes
+        self.max_pixels = max_pixels
+        self.oversize = oversize
+        self.formats = tuple(formats)
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+
+    @classmethod
+    def from_env(cls):
+        formats = os.environ.get("TUMORX_UPLOAD_FORMATS", "JPEG,PNG")
+        return cls(
+            max_bytes=int(float(os.environ.get("TUMORX_MAX_UPLOAD_MB", "20")) * 1024 * 1024),
+            max_pixels=int(os.environ.get("TUMORX_MAX_PIXELS", "40000000")),
+            oversize=os.environ.get("TUMORX_OVERSIZE_ACTION", "downscale").lower(),
+            formats=[f.strip().upper() for f in formats.split(",") if f.strip()],
+            rate_limit=int(os.environ.get("TUMORX_RATE_LIMIT", "120")),
+            rate_window=float(os.environ.get("TUMORX_RATE_WINDOW_S", "60")),
+        )
+
+    def inspect(self, upload):
+        """Check an upload from its size and header alone; returns an Admission."""
+        n_bytes = getattr(upload, "size", None)
+        if n_bytes is None:
+            n_bytes = len(upload.getvalue())
+        if self.max_bytes and n_bytes > self.max_bytes:
+            return Admission(upload, code="bytes", reason=(
+                f"file is {n_bytes / 2**20:.1f} MB (limit {self.max_bytes / 2**20:.0f} MB)"))
+
+        try:
+            fmt, size, mode = read_header(upload)
+        except Image.DecompressionBombError:
+            return Admission(upload, code="bomb", reason="image dimensions exceed the decompression-bomb limit")
+        except Exception:
+            return Admission(upload, code="unreadable", reason="file is not a readable image")
+        admission = Admission(upload, format=fmt, size=size, mode=mode)
+
+        if fmt not in self.formats:
+            admission.code, admission.reason = "format", f"{fmt or 'unknown'} images are not accepted"
+            return admission
+
+        w, h = size
+        if self.max_pixels and w * h > self.max_pixels:
+            if self.oversize == "downscale" and fmt == "JPEG":
+                scale = 2
+                while scale <= MAX_DRAFT_SCALE and w * h / (scale * scale) > self.max_pixels:
+                    scale *= 2
+                if scale <= MAX_DRAFT_SCALE:
+                    admission.max_side = max(1, min(w, h) // scale)
+                    return admission
+            admission.code, admission.reason = "pixels", (
+                f"{w}x{h} is {w * h / 1e6:.1f} MP (limit {self.max_pixels / 1e6:.1f} MP)")
+        return admission
+
+
+class RateLimit:
+    """Sliding-window counter; one instance per session."""
+
+    def __init__(self, limit, window):
+        self.limit = limit
+        self.window = window
+        self._times = deque()
+
+    def allow(self, now=None):
+        if not self.limit:
+            return True
+        now = time.monotonic() if now is None else now
+        while self._times and now - self._times[0] >= self.window:
+            self._times.popleft()
+        if len(self._times) >= self.limit:
+            return False
+        self._times.append(now)
+        return True
+
+    def retry_after(self, now=None):
+        if not self._times or len(self._times) < self.limit:
+            return 0.0
+        now = time.monotonic() if now is None else now
+        return max(0.0, self.window - (now - self._times[0]))
+
+
+class AdmissionStats:
+    """Process-wide admitted / downscaled / rejected counts."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.admitted = 0
+        self.downscaled = 0
+        self.rejected = Counter()
+
+    def record(self, admission):
+        with self._lock:
+            if not admission.ok:
+                self.rejected[admission.code] += 1
+                return
+            self.admitted += 1
+            if admission.downscaled:
+                self.downscaled += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "admitted": self.admitted,
+                "downscaled": self.downscaled,
+                "rejected": sum(self.rejected.values()),
+                "rejected_by_reason": dict(self.rejected),
+            }
+
+
+policy = AdmissionPolicy.from_env()
+stats = AdmissionStats()
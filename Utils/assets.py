@@ -0,0 +1,101 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+
+# Static asset pipeline for the UI.
+# Files under assets/ (theme CSS, favicon, any fonts added later) are copied to
+# static/ under content-hashed names, e.g. theme.3f2a9c01de.css, and CSS
+# url() references are rewritten to the hashed names. Because a name only
+# ever maps to one content, clients and proxies can cache them indefinitely
+# ("Cache-Control: public, max-age=31536000, immutable").
+# static/manifest.json maps logical names to hashed ones.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC_DIR = os.path.join(ROOT, "assets")
+OUT_DIR = os.path.join(ROOT, "static")
+MANIFEST = "manifest.json"
+
+_URL_RE = re.compile(r"url\(\s*(['\"]?)([^'\")]+)\1\s*\)")
+
+
+def _hashed_name(rel_path, data):
+    stem, ext = os.path.splitext(os.path.basename(rel_path))
+    digest = hashlib.sha256(data).hexdigest()[:10]
+    return f"{stem}.{digest}{ext}"
+
+
+def _list_sources(src_dir):
+    for dirpath, _, filenames in os.walk(src_dir):
+        for fn in sorted(filenames):
+            if fn.startswith("."):
+                continue
+            full = os.path.join(dirpath, fn)
+            yield os.path.relpath(full, src_dir).replace(os.sep, "/"), full
+
+
+# ---------------- Build ----------------
+def build_assets(src_dir=SRC_DIR, out_dir=OUT_DIR):
+    """Copy assets to ``out_dir`` under hashed names; returns the manifest dict."""
+    os.makedirs(out_dir, exist_ok=True)
+    sources = dict(_list_sources(src_dir))
+    manifest = {}
+
+    # Non-CSS first so stylesheets can point at the hashed fonts/images
+    css = [rel for rel in sources if rel.endswith(".css")]
+    for rel in [r for r in sources if r not in css] + css:
+        with open(sources[rel], "rb") as f:
+            data = f.read()
+        if rel.endswith(".css"):
+            base = os.path.dirname(rel)
+
+            def rewrite(m):
+                ref = m.group(2)
+                key = os.path.normpath(os.path.join(base, ref)).replace(os.sep, "/")
+                if key not in manifest:
+                    return m.group(0)
+                return f"url('{manifest[key]}')"
+
+            data = _URL_RE.sub(rewrite, data.decode("utf-8")).encode("utf-8")
+        name = _hashed_name(rel, data)
+        manifest[rel] = name
+        out_path = os.path.join(out_dir, name)
+        if not os.path.exists(out_path):
+            with open(out_path, "wb") as f:
+                f.write(data)
+
+    # Drop stale hashed copies from earlier builds
+    keep = set(manifest.values()) | {MANIFEST}
+    for fn in os.listdir(out_dir):
+        if fn not in keep:
+            path = os.path.join(out_dir, fn)
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                os.remove(path)
+
+    with open(os.path.join(out_dir, MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+# ---------------- Serving ----------------
+def register_assets(out_dir=OUT_DIR):
+    """Build assets and expose ``out_dir`` over HTTP; returns {logical name: URL}.
+
+    The directory is registered as a (never rendered) Streamlit component,
+    whose file route serves stylesheets and fonts with their real MIME types,
+    unlike the app static route which only allows a handful of extensions.
+    """
+    import streamlit.components.v1 as components
+
+    manifest = build_assets(out_dir=out_dir)
+    component = components.declare_component("tumorx_assets", path=out_dir)
+    base = f"component/{component.name}"
+    return {logical: f"{base}/{hashed}" for logical, hashed in manifest.items()}
+
+
+if __name__ == "__main__":
+    for logical, hashed in build_assets().items():
+        print(f"{logical} -> {hashed}")
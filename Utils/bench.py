@@ -0,0 +1,327 @@
+import argparse
+import io
+import json
+import time
+
+import numpy as np
+from PIL import Image
+
+from Utils.rle import rle_encode, rle_decode, rle_compress, rle_decompress
+
+# Micro-benchmarks for TumorX helpers.
+# Run with:  python -m Utils.bench <name> [options]
+
+
+# ---------------- Synthetic data ----------------
+def synthetic_masks(n, size=256, max_blobs=3, seed=0):
+    """Binary masks with a few elliptical lesions, similar to U-Net output."""
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[:size, :size]
+    masks = np.zeros((n, size, size), dtype=np.uint8)
+    for i in range(n):
+        for _ in range(rng.integers(0, max_blobs + 1)):
+            cy, cx = rng.uniform(0.15, 0.85, 2) * size
+            ry, rx = rng.uniform(0.03, 0.15, 2) * size
+            masks[i] |= (((yy - cy) / ry) ** 2 + ((xx - cx) / rx) ** 2 <= 1).astype(np.uint8)
+    return masks
+
+
+def _timeit(fn, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats
+
+
+# ---------------- RLE ----------------
+def bench_rle(n=200, size=256, repeats=3):
+    masks = synthetic_masks(n, size)
+
+    encoded = [rle_encode(m) for m in masks]
+    for m, rle in zip(masks, encoded):
+        assert np.array_equal(rle_decode(rle), m), "RLE round trip failed"
+        assert np.array_equal(rle_decode(rle_decompress(rle_compress(rle))), m), \
+            "compressed RLE round trip failed"
+
+    t_enc = _timeit(lambda: [rle_encode(m) for m in masks], repeats)
+    t_dec = _timeit(lambda: [rle_decode(r) for r in encoded], repeats)
+    compressed = [rle_compress(r) for r in encoded]
+    t_cmp = _timeit(lambda: [rle_compress(r) for r in encoded], repeats)
+
+    def png_size(m):
+        buf = io.BytesIO()
+        Image.fromarray(m * 255).convert("1").save(buf, format="PNG", optimize=True)
+        return buf.tell()
+
+    raw_bytes = masks[0].size * n
+    sizes = {
+        "raw uint8": raw_bytes,
+        "packed bits": np.packbits(masks, axis=-1).nbytes,
+        "png (1-bit)": sum(png_size(m) for m in masks),
+        "rle json": sum(len(json.dumps(r)) for r in encoded),
+        "rle string": sum(len(json.dumps(r)) for r in compressed),
+    }
+
+    print(f"RLE benchmark: {n} masks of {size}x{size}")
+    print(f"  encode     {n / t_enc:10.0f} masks/s  ({t_enc / n * 1e6:8.1f} us/mask)")
+    print(f"  decode     {n / t_dec:10.0f} masks/s  ({t_dec / n * 1e6:8.1f} us/mask)")
+    print(f"  compress   {n / t_cmp:10.0f} masks/s  ({t_cmp / n * 1e6:8.1f} us/mask)")
+    print("  storage (bytes per mask):")
+    for name, total in sizes.items():
+        print(f"    {name:<12} {total / n:10.1f}  ({raw_bytes / max(total, 1):6.1f}x vs raw)")
+
+
+# ---------------- Coarse-to-fine segmentation ----------------
+def dice(a, b):
+    a, b = a.astype(bool), b.astype(bool)
+    denom = a.sum() + b.sum()
+    return 1.0 if denom == 0 else 2.0 * np.logical_and(a, b).sum() / denom
+
+
+def bench_roi(n=20, size=1024, model_path=None, repeats=1):
+    import tempfile
+    from Utils.segment import load_segmentation_model
+    from Utils.synthetic import build_synthetic_models, synthetic_scan, synthetic_lesion_mask
+    from Utils.roi import segment_tiled, segment_coarse_to_fine
+
+    tmp = None
+    if model_path is None:
+        tmp = tempfile.TemporaryDirectory(prefix="tumorx-bench-")
+        _, model_path = build_synthetic_models(tmp.name)
+    model = load_segmentation_model(model_path, inference_only=True)
+
+    scans = [synthetic_scan(size, seed=i) for i in range(n)]
+    # Warm both paths so graph tracing is not timed
+    segment_tiled(model, scans[0])
+    segment_coarse_to_fine(model, scans[0])
+
+    # The synthetic U-Net finds the scans' lesions, so both paths are also scored against them
+    t_tiled, t_c2f, dices, windows, truth_tiled, truth_c2f = [], [], [], [], [], []
+    for seed, scan in enumerate(scans):
+        for _ in range(repeats):
+            start = time.perf_counter()
+            ref = segment_tiled(model, scan)
+            t_tiled.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            mask, info = segment_coarse_to_fine(model, scan)
+            t_c2f.append(time.perf_counter() - start)
+        dices.append(dice(mask, ref))
+        windows.append(info["windows"])
+        truth = synthetic_lesion_mask(size, seed=seed)
+        truth_tiled.append(dice(ref, truth))
+        truth_c2f.append(dice(mask, truth))
+    if tmp is not None:
+        tmp.cleanup()
+
+    print(f"Coarse-to-fine benchmark: {n} synthetic scans of {size}x{size}")
+    print(f"  full tiled      {np.mean(t_tiled) * 1000:8.1f} ms/scan (p90 {np.percentile(t_tiled, 90) * 1000:.1f})")
+    print(f"  coarse-to-fine  {np.mean(t_c2f) * 1000:8.1f} ms/scan (p90 {np.percentile(t_c2f, 90) * 1000:.1f})"
+          f"  speedup {np.mean(t_tiled) / np.mean(t_c2f):.2f}x")
+    print(f"  fine windows    {np.mean(windows):8.1f} per scan")
+    print(f"  Dice vs tiled   mean {np.mean(dices):.4f}  min {np.min(dices):.4f}")
+    print(f"  Dice vs lesion  tiled {np.mean(truth_tiled):.4f}  coarse-to-fine {np.mean(truth_c2f):.4f}")
+
+
+# ---------------- PDF reports ----------------
+REPORT_CONFIGS = {
+    "original png": {"format": "original"},
+    "png @150dpi": {"format": "png", "dpi": 150},
+    "jpeg q85 @150dpi": {"format": "jpeg", "dpi": 150, "jpeg_quality": 85},
+    "jpeg q90 @300dpi": {"format": "jpeg", "dpi": 300, "jpeg_quality": 90},
+}
+
+
+def bench_report(n=5, size=2048):
+    import os
+    from Utils.report import generate_pdf_report
+    from Utils.synthetic import synthetic_scan
+
+    scan = synthetic_scan(size)
+    mask = synthetic_masks(1, size, max_blobs=2, seed=1)[0]
+    overlay = scan.convert("RGBA")
+    red = Image.new("RGBA", overlay.size, (255, 0, 0, 255))
+    overlay.paste(red, mask=Image.fromarray(mask * 102))   # ~0.4 alpha like the UI overlay
+
+    print(f"PDF report benchmark: {n} reports per config, {size}x{size} scan + overlay")
+    for name, options in REPORT_CONFIGS.items():
+        times, sizes = [], []
+        for _ in range(n):
+            start = time.perf_counter()
+            path = generate_pdf_report("glioma", 0.93, scan, overlay, image_options=options)
+            times.append(time.perf_counter() - start)
+            sizes.append(os.path.getsize(path))
+            os.remove(path)
+        print(f"  {name:<18} {np.mean(sizes) / 1024:9.1f} KB  {np.mean(times) * 1000:8.1f} ms/report")
+
+
+# ---------------- Perceptual hash ----------------
+def bench_phash(sizes=(1000, 10000, 100000, 300000), n_images=64, queries=2000, seed=0):
+    from Utils.phash import phash_batch, hamming, pixel_signature, signature_diff, PHashIndex
+    from Utils.synthetic import synthetic_scan
+
+    scans = [synthetic_scan(512, seed=i) for i in range(n_images)]
+    start = time.perf_counter()
+    hashes = phash_batch(scans)
+    t_hash = (time.perf_counter() - start) / n_images
+
+    # Robustness: JPEG re-encode + downscale of the same scan should stay within a few bits
+    def degrade(im):
+        buf = io.BytesIO()
+        im.resize((384, 384), Image.BILINEAR).convert("RGB").save(buf, format="JPEG", quality=70)
+        buf.seek(0)
+        return Image.open(buf)
+
+    copies = [degrade(im) for im in scans]
+    degraded = phash_batch(copies)
+    near = [hamming(a, b) for a, b in zip(hashes, degraded)]
+    far = [hamming(hashes[i], hashes[j]) for i in range(n_images) for j in range(i + 1, n_images)]
+    # The pixel signature confirms hash matches; distinct scans must stay well above the tolerance
+    sigs = [pixel_signature(im) for im in scans]
+    sig_near = [signature_diff(a, pixel_signature(b)) for a, b in zip(sigs, copies)]
+    sig_far = [signature_diff(sigs[i], sigs[j]) for i in range(n_images) for j in range(i + 1, n_images)]
+
+    print(f"pHash benchmark: {n_images} synthetic 512x512 scans")
+    print(f"  hash       {1 / t_hash:10.0f} images/s  ({t_hash * 1e3:8.2f} ms/image)")
+    print(f"  distance   re-encoded copy mean {np.mean(near):.1f} max {np.max(near)} bits; "
+          f"distinct scans min {np.min(far)} bits, {np.mean(np.array(far) <= 8) * 100:.1f}% within 8")
+    print(f"  signature  re-encoded copy max {np.max(sig_near)}; distinct scans min {np.min(sig_far)} (max abs diff)")
+    print("  lookup latency vs index size:")
+
+    rng = np.random.default_rng(seed)
+    for size in sizes:
+        index = PHashIndex()
+        stored = rng.integers(0, 2 ** 64, size=size, dtype=np.uint64)
+        for i, h in enumerate(stored):
+            index.add(h, i)
+        # Half the queries are a stored hash with 2 flipped bits, half are random misses
+        picks = stored[rng.integers(0, size, queries // 2)]
+        flips = [(1 << int(a)) | (1 << int(b)) for a, b in rng.integers(0, 64, (queries // 2, 2))]
+        probes = [int(h) ^ f for h, f in zip(picks, flips)]
+        probes += [int(h) for h in rng.integers(0, 2 ** 64, size=queries - len(probes), dtype=np.uint64)]
+        hits = 0
+        start = time.perf_counter()
+        for h in probes:
+            hits += bool(index.query(h))
+        t = (time.perf_counter() - start) / len(probes)
+        print(f"    {size:>8} entries  {t * 1e6:8.1f} us/query  ({hits}/{len(probes)} hits)")
+
+
+# ---------------- Test-time augmentation ----------------
+def bench_tta(n=20, size=512, repeats=3):
+    import tempfile
+    from Utils.classification import load_classification_model, classify_batch
+    from Utils.segment import load_segmentation_model, segment_images
+    from Utils.synthetic import build_synthetic_models, synthetic_scan
+    from Utils.tta import VIEWS, classify_tta, segment_tta
+
+    with tempfile.TemporaryDirectory(prefix="tumorx-bench-") as tmp:
+        cls_path, seg_path = build_synthetic_models(tmp)
+        cls_model = load_classification_model(cls_path, inference_only=True)
+        seg_model = load_segmentation_model(seg_path, inference_only=True)
+
+    scans = [synthetic_scan(size, seed=i) for i in range(n)]
+    cases = {
+        "classify plain": lambda im: classify_batch(cls_model, [im]),
+        "classify tta": lambda im: classify_tta(cls_model, [im]),
+        "segment plain": lambda im: segment_images(seg_model, [im]),
+        "segment tta": lambda im: segment_tta(seg_model, [im]),
+    }
+    for fn in cases.values():     # trace every batch shape once
+        fn(scans[0])
+
+    print(f"TTA benchmark: {n} synthetic {size}x{size} scans, {len(VIEWS)} views in one batch")
+    means = {}
+    for name, fn in cases.items():
+        times = []
+        for scan in scans:
+            start = time.perf_counter()
+            for _ in range(repeats):
+                fn(scan)
+            times.append((time.perf_counter() - start) / repeats)
+        means[name] = np.mean(times)
+        print(f"  {name:<15} {means[name] * 1000:8.1f} ms/scan (p90 {np.percentile(times, 90) * 1000:.1f})")
+    for kind in ("classify", "segment"):
+        print(f"  {kind} tta / plain   {means[kind + ' tta'] / means[kind + ' plain']:5.2f}x "
+              f"(sequential views would be ~{len(VIEWS)}x)")
+
+
+# ---------------- Grad-CAM ----------------
+def bench_gradcam(n=20, batch_size=8, size=512, repeats=3):
+    import tempfile
+    from Utils.classification import load_classification_model, classify_batch
+    from Utils.gradcam import overlay_cam
+    from Utils.synthetic import build_synthetic_models, synthetic_scan
+
+    with tempfile.TemporaryDirectory(prefix="tumorx-bench-") as tmp:
+        cls_path, _ = build_synthetic_models(tmp)
+        model = load_classification_model(cls_path, inference_only=True)
+
+    scans = [synthetic_scan(size, seed=i) for i in range(n)]
+    batches = [scans[i:i + batch_size] for i in range(0, n, batch_size)]
+    for return_cam in (False, True):      # trace both paths for every batch shape
+        for b in batches:
+            classify_batch(model, b, return_cam=return_cam)
+
+    t_plain = _timeit(lambda: [classify_batch(model, b) for b in batches], repeats)
+    t_cam = _timeit(lambda: [classify_batch(model, b, return_cam=True) for b in batches], repeats)
+    results = [r for b in batches for r in classify_batch(model, b, return_cam=True)]
+    t_overlay = _timeit(lambda: [overlay_cam(s, r[3], max_side=640) for s, r in zip(scans, results)], repeats)
+
+    print(f"Grad-CAM benchmark: {n} synthetic {size}x{size} scans, batches of {batch_size}")
+    print(f"  classify            {t_plain / n * 1000:8.2f} ms/scan")
+    print(f"  classify + Grad-CAM {t_cam / n * 1000:8.2f} ms/scan  (+{(t_cam - t_plain) / n * 1000:.2f} ms)")
+    print(f"  heatmap overlay     {t_overlay / n * 1000:8.2f} ms/scan")
+
+
+# ---------------- CLI ----------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="TumorX micro-benchmarks")
+    sub = parser.add_subparsers(dest="name", required=True)
+
+    p = sub.add_parser("rle", help="mask run-length codec throughput and size")
+    p.add_argument("--n", type=int, default=200)
+    p.add_argument("--size", type=int, default=256)
+    p.add_argument("--repeats", type=int, default=3)
+
+    p = sub.add_parser("roi", help="coarse-to-fine vs full tiled segmentation latency and Dice")
+    p.add_argument("--n", type=int, default=20)
+    p.add_argument("--size", type=int, default=1024)
+    p.add_argument("--model", default=None, help="U-Net .keras file (default: synthetic stand-in)")
+    p.add_argument("--repeats", type=int, default=1)
+
+    p = sub.add_parser("report", help="PDF report size and build time per image encoding")
+    p.add_argument("--n", type=int, default=5)
+    p.add_argument("--size", type=int, default=2048)
+
+    p = sub.add_parser("phash", help="perceptual hash throughput, robustness and index lookup latency")
+    p.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000, 300000])
+    p.add_argument("--queries", type=int, default=2000)
+
+    p = sub.add_parser("tta", help="test-time augmentation latency vs a single plain pass")
+    p.add_argument("--n", type=int, default=20)
+    p.add_argument("--size", type=int, default=512)
+    p.add_argument("--repeats", type=int, default=3)
+
+    p = sub.add_parser("gradcam", help="classification latency with and without Grad-CAM")
+    p.add_argument("--n", type=int, default=20)
+    p.add_argument("--batch-size", type=int, default=8)
+    p.add_argument("--size", type=int, default=512)
+    p.add_argument("--repeats", type=int, default=3)
+
+    args = parser.parse_args(argv)
+    if args.name == "rle":
+        bench_rle(args.n, args.size, args.repeats)
+    elif args.name == "roi":
+        bench_roi(args.n, args.size, args.model, args.repeats)
+    elif args.name == "report":
+        bench_report(args.n, args.size)
+    elif args.name == "phash":
+        bench_phash(args.sizes, queries=args.queries)
+    elif args.name == "tta":
+        bench_tta(args.n, args.size, args.repeats)
+    elif args.name == "gradcam":
+        bench_gradcam(args.n, args.batch_size, args.size, args.repeats)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+import os
+import threading
+
+# Classifier -> segmentation cascade.
+# The cheap 128x128 classifier always runs; the 256x256 U-Net only runs when
+# the policy says the scan needs it. By default a scan is skipped when the
+# classifier says "notumor" with at least min_confidence.
+#
+#   TUMORX_CASCADE                 1 to enable (default: 0, always segment)
+#   TUMORX_CASCADE_MIN_CONFIDENCE  confidence needed to skip (default: 0.95)
+#   TUMORX_CASCADE_SKIP_LABELS     comma-separated labels that may skip (default: notumor)
+
+
+class CascadePolicy:
+    def __init__(self, enabled=False, min_confidence=0.95, skip_labels=("notumor",)):
+        self.enabled = enabled
+        self.min_confidence = min_confidence
+        self.skip_labels = tuple(skip_labels)
+
+    @classmethod
+    def from_env(cls):
+        labels = os.environ.get("TUMORX_CASCADE_SKIP_LABELS", "notumor")
+        return cls(
+            enabled=os.environ.get("TUMORX_CASCADE", "0") == "1",
+            min_confidence=float(os.environ.get("TUMORX_CASCADE_MIN_CONFIDENCE", "0.95")),
+            skip_labels=[l.strip() for l in labels.split(",") if l.strip()],
+        )
+
+    def should_segment(self, class_label, confidence):
+        """Return (run_segmentation, reason); reason explains a skip, else None."""
+        if not self.enabled:
+            return True, None
+        if class_label in self.skip_labels and confidence >= self.min_confidence:
+            return False, (f"classifier reported '{class_label}' with "
+                           f"{confidence * 100:.1f}% confidence "
+                           f"(cascade threshold {self.min_confidence * 100:.0f}%)")
+        return True, None
+
+
+class CascadeStats:
+    """Process-wide cascade hit rate and estimated segmentation time saved."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.total = 0
+        self.skipped = 0
+        self.segmented = 0
+        self.seg_seconds = 0.0
+
+    def record(self, skipped, seg_seconds=None):
+        with self._lock:
+            self.total += 1
+            if skipped:
+                self.skipped += 1
+            else:
+                self.segmented += 1
+                self.seg_seconds += seg_seconds or 0.0
+
+    def snapshot(self):
+        with self._lock:
+            mean_seg = self.seg_seconds / self.segmented if self.segmented else 0.0
+            return {
+                "scans": self.total,
+                "skipped": self.skipped,
+                "hit_rate": self.skipped / self.total if self.total else 0.0,
+                "mean_segmentation_s": mean_seg,
+                "estimated_saved_s": self.skipped * mean_seg,
+            }
+
+
+policy = CascadePolicy.from_env()
+stats = CascadeStats()
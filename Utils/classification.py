@@ -2,18 +2,23 @@ import numpy as np
 import cv2
 from tensorflow.keras.models import load_model
 import io
+from Utils.profiling import profiled
+from Utils.graph_preprocess import CUSTOM_OBJECTS, uint8_batches
+from Utils.gradcam import forward_with_cam
 
 # --------- Define Classes ---------
 class_names = ['glioma', 'meningioma', 'notumor', 'pituitary']
+IMG_SIZE = (128, 128)
 
 # --------- Load Model ---------
-def load_classification_model(model_path):
-    return load_model(model_path)
+def load_classification_model(model_path, inference_only=False):
+    # inference_only skips compile state (loss, metrics, optimizer slots)
+    return load_model(model_path, compile=not inference_only, custom_objects=CUSTOM_OBJECTS)
 
 # --------- Preprocess Image ---------
-def preprocess_image_pil(pil_image, target_size=(128, 128)):
-    # Convert PIL → numpy array
-    img = np.array(pil_image)
+def preprocess_image_pil(pil_image, target_size=IMG_SIZE):
+    # Convert PIL → numpy array (grayscale, palette and RGBA uploads become RGB)
+    img = np.array(pil_image.convert("RGB"))
     # Ensure BGR like your cv2 code
     img = cv2.cvtColor(img, cv2.COLOR_RGB2BGR)
     img = cv2.resize(img, target_size)
@@ -22,10 +27,55 @@ def preprocess_image_pil(pil_image, target_size=(128, 128)):
     return img
 
 # --------- Prediction ---------
-def classify_image(model, pil_image):
-    img = preprocess_image_pil(pil_image)
-    pred_prob = model.predict(img, verbose=0)
+@profiled("classify_image")
+def classify_image(model, pil_image, labels=None, target_size=IMG_SIZE, return_probs=False,
+                   return_cam=False):
+    labels = labels or class_names
+    img = preprocess_image_pil(pil_image, target_size)
+    if return_cam:
+        # Same forward pass, plus a backward pass to the last conv layer
+        pred_prob, cams = forward_with_cam(model, img)
+    else:
+        pred_prob = model.predict(img, verbose=0)
     pred_class_index = np.argmax(pred_prob)
-    pred_class_name = class_names[pred_class_index]
+    pred_class_name = labels[pred_class_index]
     confidence = float(pred_prob[0][pred_class_index])
-    return pred_class_name, confidence
+    result = (pred_class_name, confidence)
+    if return_probs:
+        result += ({name: float(p) for name, p in zip(labels, pred_prob[0])},)
+    if return_cam:
+        result += (cams[0],)
+    return result
+
+# --------- Batch Prediction ---------
+@profiled("classify_batch")
+def classify_batch(model, pil_images, labels=None, target_size=IMG_SIZE, in_graph=False,
+                   return_cam=False):
+    """One forward pass for all images; returns [(label, confidence, probs), ...].
+
+    ``in_graph`` models (see Utils.graph_preprocess) take the raw uint8
+    pixels and preprocess inside the graph. With ``return_cam`` each tuple
+    also carries a Grad-CAM heatmap for the predicted class.
+    """
+    labels = labels or class_names
+    if in_graph:
+        groups = uint8_batches(pil_images)    # one pass per distinct image size
+    else:
+        groups = [(list(range(len(pil_images))),
+                   np.concatenate([preprocess_image_pil(im, target_size) for im in pil_images]))]
+    pred_prob = [None] * len(pil_images)
+    cams = [None] * len(pil_images)
+    for indices, batch in groups:
+        if return_cam:
+            preds, group_cams = forward_with_cam(model, batch, in_graph)
+        else:
+            preds, group_cams = model.predict(batch, verbose=0), [None] * len(indices)
+        for i, row, cam in zip(indices, preds, group_cams):
+            pred_prob[i], cams[i] = row, cam
+
+    results = []
+    for row, cam in zip(pred_prob, cams):
+        idx = int(np.argmax(row))
+        probs = {name: float(p) for name, p in zip(labels, row)}
+        results.append((labels[idx], float(row[idx]), probs) + ((cam,) if return_cam else ()))
+    return results
@@ -0,0 +1,241 @@
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import tensorflow as tf
+
+from Utils.graph_preprocess import is_in_graph, unwrap
+from Utils.registry import ModelRegistry
+
+# Evaluation over a labeled dataset laid out as in the README:
+#
+#   <data>/classification/<class name>/*.jpg|png     (one folder per class)
+#   <data>/segmentation/images/<name>.png
+#   <data>/segmentation/masks/<name>.png             (or <name>_mask.png)
+#
+# Images are decoded and resized by a tf.data pipeline running on TF's
+# thread pool and fed to the models in batches, so decoding overlaps with
+# inference. Metrics are computed with vectorised NumPy over the whole run.
+# The pipelines emit float batches, so in-graph models (uint8 input, see
+# Utils/graph_preprocess.py) are evaluated through the float model they wrap.
+#
+#   python -m Utils.evaluate --data datasets/brain_mri --out eval.json
+
+IMAGE_EXTS = (".jpg", ".jpeg", ".png")
+AUTOTUNE = tf.data.AUTOTUNE
+
+
+def _list_images(folder):
+    return sorted(os.path.join(folder, f) for f in os.listdir(folder)
+                  if f.lower().endswith(IMAGE_EXTS))
+
+
+# ---------------- Datasets ----------------
+def classification_files(cls_dir, class_names):
+    paths, labels = [], []
+    for idx, name in enumerate(class_names):
+        folder = os.path.join(cls_dir, name)
+        if not os.path.isdir(folder):
+            continue
+        files = _list_images(folder)
+        paths.extend(files)
+        labels.extend([idx] * len(files))
+    return paths, np.array(labels, dtype=np.int64)
+
+
+def segmentation_pairs(seg_dir):
+    img_dir, mask_dir = os.path.join(seg_dir, "images"), os.path.join(seg_dir, "masks")
+    masks = {}
+    for path in _list_images(mask_dir):
+        stem = os.path.splitext(os.path.basename(path))[0]
+        masks[stem[:-5] if stem.endswith("_mask") else stem] = path
+    pairs = []
+    for path in _list_images(img_dir):
+        stem = os.path.splitext(os.path.basename(path))[0]
+        if stem in masks:
+            pairs.append((path, masks[stem]))
+    return pairs
+
+
+def _decode(path, channels):
+    data = tf.io.read_file(path)
+    return tf.image.decode_image(data, channels=channels, expand_animations=False)
+
+
+def _cls_pipeline(paths, target_size, batch_size):
+    h, w = target_size
+
+    def load(path):
+        # Same as Utils.classification.preprocess_image_pil: BGR, bilinear resize, /255
+        img = tf.reverse(_decode(path, 3), axis=[-1])
+        img = tf.image.resize(tf.cast(img, tf.float32), (h, w), method="bilinear")
+        return img / 255.0
+
+    return (tf.data.Dataset.from_tensor_slices(paths)
+            .map(load, num_parallel_calls=AUTOTUNE)
+            .batch(batch_size)
+            .prefetch(AUTOTUNE))
+
+
+def _seg_pipeline(pairs, target_size, batch_size):
+    def load(img_path, mask_path):
+        # Same as Utils.segment.preprocess_image_pil; masks resized nearest-neighbour
+        img = tf.image.convert_image_dtype(_decode(img_path, 1), tf.float32)
+        img = tf.image.resize(img, target_size, method="bilinear")
+        mask = tf.image.resize(_decode(mask_path, 1), target_size, method="nearest")
+        return img, tf.cast(mask[..., 0] > 127, tf.uint8)
+
+    img_paths = [p for p, _ in pairs]
+    mask_paths = [m for _, m in pairs]
+    return (tf.data.Dataset.from_tensor_slices((img_paths, mask_paths))
+            .map(load, num_parallel_calls=AUTOTUNE)
+            .batch(batch_size)
+            .prefetch(AUTOTUNE))
+
+
+# ---------------- Metrics ----------------
+def confusion_matrix(y_true, y_pred, n_classes):
+    idx = y_true * n_classes + y_pred
+    return np.bincount(idx, minlength=n_classes * n_classes).reshape(n_classes, n_classes)
+
+
+def classification_metrics(cm, class_names):
+    tp = np.diag(cm).astype(np.float64)
+    predicted = cm.sum(axis=0)
+    actual = cm.sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        precision = np.where(predicted > 0, tp / predicted, 0.0)
+        recall = np.where(actual > 0, tp / actual, 0.0)
+        f1 = np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0)
+    return {
+        "accuracy": float(tp.sum() / max(cm.sum(), 1)),
+        "confusion_matrix": cm.tolist(),
+        "per_class": {
+            name: {"precision": float(precision[i]), "recall": float(recall[i]),
+                   "f1": float(f1[i]), "support": int(actual[i])}
+            for i, name in enumerate(class_names)
+        },
+    }
+
+
+def dice_iou(pred, true):
+    """Per-image Dice and IoU for stacks of binary masks (N, H, W). Empty vs empty scores 1."""
+    pred = pred.astype(bool).reshape(len(pred), -1)
+    true = true.astype(bool).reshape(len(true), -1)
+    inter = np.logical_and(pred, true).sum(axis=1)
+    p_sum, t_sum = pred.sum(axis=1), true.sum(axis=1)
+    union = p_sum + t_sum - inter
+    with np.errstate(divide="ignore", invalid="ignore"):
+        dice = np.where(p_sum + t_sum > 0, 2 * inter / (p_sum + t_sum), 1.0)
+        iou = np.where(union > 0, inter / union, 1.0)
+    return dice, iou, inter, p_sum, t_sum
+
+
+# ---------------- Runners ----------------
+def evaluate_classifier(model, spec, cls_dir, batch_size=64):
+    class_names = list(spec.class_names)
+    paths, labels = classification_files(cls_dir, class_names)
+    if not paths:
+        return None
+    if is_in_graph(spec):
+        model = unwrap(model)
+    start = time.perf_counter()
+    preds = []
+    for batch in _cls_pipeline(paths, spec.input_shape[:2], batch_size):
+        preds.append(np.argmax(model.predict_on_batch(batch), axis=-1))
+    elapsed = time.perf_counter() - start
+    preds = np.concatenate(preds)
+    result = classification_metrics(confusion_matrix(labels, preds, len(class_names)), class_names)
+    result.update({"images": len(paths), "seconds": elapsed, "images_per_s": len(paths) / elapsed})
+    return result
+
+
+def evaluate_segmenter(model, spec, seg_dir, batch_size=32, threshold=0.5):
+    pairs = segmentation_pairs(seg_dir)
+    if not pairs:
+        return None
+    if is_in_graph(spec):
+        model = unwrap(model)
+    start = time.perf_counter()
+    dice, iou, inter, p_sum, t_sum = [], [], [], [], []
+    for imgs, masks in _seg_pipeline(pairs, spec.input_shape[:2], batch_size):
+        pred = model.predict_on_batch(imgs)[..., 0] > threshold
+        d, i, n, p, t = dice_iou(pred, masks.numpy())
+        dice.append(d); iou.append(i); inter.append(n); p_sum.append(p); t_sum.append(t)
+    elapsed = time.perf_counter() - start
+    dice, iou = np.concatenate(dice), np.concatenate(iou)
+    inter, p_sum, t_sum = (np.concatenate(x).sum() for x in (inter, p_sum, t_sum))
+    return {
+        "images": len(pairs),
+        "seconds": elapsed,
+        "images_per_s": len(pairs) / elapsed,
+        "dice_mean": float(dice.mean()),
+        "dice_median": float(np.median(dice)),
+        "iou_mean": float(iou.mean()),
+        "dice_global": float(2 * inter / max(p_sum + t_sum, 1)),
+        "iou_global": float(inter / max(p_sum + t_sum - inter, 1)),
+        "per_image": [
+            {"image": os.path.basename(img), "dice": float(d), "iou": float(i)}
+            for (img, _), d, i in zip(pairs, dice, iou)
+        ],
+    }
+
+
+def format_report(report):
+    lines = []
+    cls = report.get("classification")
+    if cls:
+        lines.append(f"Classification ({report['versions']['classifier']}): {cls['images']} images, "
+                     f"{cls['images_per_s']:.0f} img/s, accuracy {cls['accuracy'] * 100:.2f}%")
+        lines.append(f"  {'class':<12} {'precision':>9} {'recall':>7} {'f1':>6} {'support':>8}")
+        for name, m in cls["per_class"].items():
+            lines.append(f"  {name:<12} {m['precision']:>9.3f} {m['recall']:>7.3f} "
+                         f"{m['f1']:>6.3f} {m['support']:>8}")
+        lines.append("  confusion matrix (rows = true, cols = predicted):")
+        for name, row in zip(cls["per_class"], cls["confusion_matrix"]):
+            lines.append(f"    {name:<12} " + " ".join(f"{v:>6}" for v in row))
+    seg = report.get("segmentation")
+    if seg:
+        lines.append(f"Segmentation ({report['versions']['segmenter']}): {seg['images']} pairs, "
+                     f"{seg['images_per_s']:.0f} img/s")
+        lines.append(f"  Dice mean {seg['dice_mean']:.4f}  median {seg['dice_median']:.4f}  "
+                     f"global {seg['dice_global']:.4f}")
+        lines.append(f"  IoU  mean {seg['iou_mean']:.4f}  global {seg['iou_global']:.4f}")
+    return "\n".join(lines) or "No evaluation data found."
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Evaluate TumorX models on a labeled dataset")
+    parser.add_argument("--data", required=True, help="dataset root (classification/, segmentation/)")
+    parser.add_argument("--model-dir", default="models")
+    parser.add_argument("--cls-version", default=None)
+    parser.add_argument("--seg-version", default=None)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--out", default=None, help="write the full report (incl. per-image scores) as JSON")
+    args = parser.parse_args(argv)
+
+    registry = ModelRegistry.from_dir(args.model_dir, inference_only=True)
+    report = {"versions": {}}
+
+    cls_dir = os.path.join(args.data, "classification")
+    if os.path.isdir(cls_dir):
+        model, spec = registry.get("classifier", args.cls_version)
+        report["versions"]["classifier"] = spec.version
+        report["classification"] = evaluate_classifier(model, spec, cls_dir, args.batch_size)
+
+    seg_dir = os.path.join(args.data, "segmentation")
+    if os.path.isdir(seg_dir):
+        model, spec = registry.get("segmenter", args.seg_version)
+        report["versions"]["segmenter"] = spec.version
+        report["segmentation"] = evaluate_segmenter(model, spec, seg_dir, max(1, args.batch_size // 2))
+
+    print(format_report(report))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+# Structured inference event log.
+# log_event() only enqueues; a background thread batches records into
+# <dir>/events.jsonl and flushes every flush_interval seconds or batch_size
+# records, so the Streamlit script thread never waits on disk I/O. The
+# active file is rotated to events-<timestamp>.jsonl once it exceeds
+# max_bytes or is older than rotate_seconds.
+#
+#   TUMORX_EVENT_LOG               0 to disable (default: 1)
+#   TUMORX_EVENT_LOG_DIR           output directory (default: ./logs)
+#   TUMORX_EVENT_LOG_MAX_MB        rotate above this size (default: 50)
+#   TUMORX_EVENT_LOG_ROTATE_HOURS  rotate after this age (default: 24)
+
+ACTIVE_FILE = "events.jsonl"
+
+
+def new_event_id():
+    return uuid.uuid4().hex
+
+
+class EventLog:
+    def __init__(self, log_dir, max_bytes=50 * 1024 * 1024, rotate_seconds=24 * 3600,
+                 flush_interval=1.0, batch_size=256, max_queue=10000):
+        self.log_dir = log_dir
+        self.max_bytes = max_bytes
+        self.rotate_seconds = rotate_seconds
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.dropped = 0
+        self.written = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._closed = threading.Event()
+        self._file = None
+        self._opened_at = 0.0
+        self._thread = threading.Thread(target=self._run, name="tumorx-event-log", daemon=True)
+        self._thread.start()
+
+    # ----- producer side -----
+    def log(self, event, **fields):
+        record = {"ts": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+                  "event": event, **fields}
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self, timeout=5.0):
+        if not self._closed.is_set():
+            self._closed.set()
+            self._thread.join(timeout)
+
+    # ----- writer thread -----
+    def _open(self):
+        os.makedirs(self.log_dir, exist_ok=True)
+        path = os.path.join(self.log_dir, ACTIVE_FILE)
+        self._file = open(path, "a", encoding="utf-8")
+        # Age of an existing file counts from its creation, not from our restart
+        self._opened_at = os.path.getctime(path) if self._file.tell() else time.time()
+
+    def _maybe_rotate(self):
+        if self._file is None:
+            return
+        too_big = self._file.tell() >= self.max_bytes
+        too_old = time.time() - self._opened_at >= self.rotate_seconds
+        if not (too_big or too_old) or self._file.tell() == 0:
+            return
+        self._file.close()
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        src = os.path.join(self.log_dir, ACTIVE_FILE)
+        os.replace(src, os.path.join(self.log_dir, f"events-{stamp}-{os.getpid()}.jsonl"))
+        self._open()
+
+    def _write(self, batch):
+        if self._file is None:
+            self._open()
+        self._file.write("".join(json.dumps(r, default=str) + "\n" for r in batch))
+        self._file.flush()
+        self.written += len(batch)
+        self._maybe_rotate()
+
+    def _run(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            timeout = max(0.0, deadline - time.monotonic())
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                pass
+            now = time.monotonic()
+            if batch and (len(batch) >= self.batch_size or now >= deadline):
+                try:
+                    self._write(batch)
+                except Exception:
+                    logger.exception("Failed to write %d event records", len(batch))
+                batch = []
+            if now >= deadline:
+                deadline = now + self.flush_interval
+            if self._closed.is_set() and self._queue.empty():
+                break
+        if batch:
+            try:
+                self._write(batch)
+            except Exception:
+                logger.exception("Failed to write %d event records", len(batch))
+        if self._file is not None:
+            self._file.close()
+
+
+# ---------------- Process-wide log ----------------
+_log = None
+_log_lock = threading.Lock()
+
+
+def get_event_log():
+    global _log
+    if os.environ.get("TUMORX_EVENT_LOG", "1") == "0":
+        return None
+    with _log_lock:
+        if _log is None:
+            _log = EventLog(
+                os.environ.get("TUMORX_EVENT_LOG_DIR", "logs"),
+                max_bytes=int(float(os.environ.get("TUMORX_EVENT_LOG_MAX_MB", "50")) * 1024 * 1024),
+                rotate_seconds=float(os.environ.get("TUMORX_EVENT_LOG_ROTATE_HOURS", "24")) * 3600,
+            )
+            atexit.register(_log.close)
+    return _log
+
+
+def log_event(event, **fields):
+    log = get_event_log()
+    if log is not None:
+        log.log(event, **fields)
@@ -0,0 +1,151 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+from Utils.classification import preprocess_image_pil as cls_preprocess
+from Utils.segment import preprocess_image_pil as seg_preprocess
+from Utils.graph_preprocess import IN_GRAPH, wrap_classifier, wrap_segmenter, predict_raw
+from Utils.registry import ModelRegistry, KINDS, REGISTRY_FILE, _LOADERS, register_model
+
+# Export registered models with their preprocessing folded into the graph
+# (Utils/graph_preprocess.py), then check the exported model against the
+# Python preprocessing path on the same images before registering it.
+#
+#   python -m Utils.export --model-dir models --images scans/ --register
+#
+# Exported files are written next to the source model as <name>_in_graph.keras
+# and registered as version "<source version>+graph".
+
+IMAGE_EXTS = (".jpg", ".jpeg", ".png")
+
+
+def load_images(folder=None, limit=32):
+    if folder is None:
+        from Utils.synthetic import synthetic_scan
+        # Mixed sizes, so the size-grouped batching path is exercised too
+        return [synthetic_scan(size, seed=i) for i, size in enumerate([384, 512, 640, 1024] * (limit // 4))]
+    paths = sorted(os.path.join(folder, f) for f in os.listdir(folder) if f.lower().endswith(IMAGE_EXTS))
+    images = []
+    for path in paths[:limit]:
+        with Image.open(path) as im:
+            images.append(im.convert("RGB"))
+    return images
+
+
+# ---------------- Export ----------------
+def export_model(model, spec, out_path):
+    if spec.kind == "classifier":
+        wrapped = wrap_classifier(model, spec.input_shape[:2])
+    else:
+        wrapped = wrap_segmenter(model, spec.input_shape[:2])
+    wrapped.save(out_path)
+    return wrapped
+
+
+# ---------------- Parity ----------------
+def _python_path(model, spec, images):
+    if spec.kind == "classifier":
+        h, w = spec.input_shape[:2]
+        batch = np.concatenate([cls_preprocess(im, (w, h)) for im in images])
+    else:
+        batch = np.stack([seg_preprocess(im, spec.input_shape[:2]).numpy() for im in images])
+    return model.predict(batch, verbose=0)
+
+
+def check_parity(model, exported, spec, images, threshold=0.5):
+    """Compare exported (uint8, in-graph) against the Python preprocessing path."""
+    start = time.perf_counter()
+    ref = _python_path(model, spec, images)
+    t_ref = time.perf_counter() - start
+    start = time.perf_counter()
+    out = predict_raw(exported, images)
+    t_out = time.perf_counter() - start
+
+    result = {
+        "images": len(images),
+        "max_abs_diff": float(np.abs(ref - out).max()),
+        "mean_abs_diff": float(np.abs(ref - out).mean()),
+        "python_ms_per_image": t_ref / len(images) * 1000,
+        "in_graph_ms_per_image": t_out / len(images) * 1000,
+    }
+    if spec.kind == "classifier":
+        result["label_agreement"] = float(np.mean(ref.argmax(-1) == out.argmax(-1)))
+    else:
+        a = ref[..., 0] > threshold
+        b = out[..., 0] > threshold
+        inter = np.logical_and(a, b).sum(axis=(1, 2))
+        total = a.sum(axis=(1, 2)) + b.sum(axis=(1, 2))
+        dice = np.where(total > 0, 2 * inter / np.maximum(total, 1), 1.0)
+        result["mask_dice_mean"] = float(dice.mean())
+        result["mask_dice_min"] = float(dice.min())
+    return result
+
+
+def parity_ok(result, atol, min_dice):
+    if result["max_abs_diff"] > atol:
+        return False
+    if "label_agreement" in result:
+        return result["label_agreement"] == 1.0
+    return result["mask_dice_min"] >= min_dice
+
+
+def _ensure_registry(registry, model_dir):
+    # A legacy model dir has no registry.json; write its implicit entries first
+    # so registering the export does not hide the original versions.
+    if os.path.exists(os.path.join(model_dir, REGISTRY_FILE)):
+        return
+    for spec in registry.specs.values():
+        register_model(model_dir, spec.kind, spec.version, os.path.relpath(spec.path, model_dir),
+                       spec.input_shape, spec.class_names or None, make_default=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export models with in-graph preprocessing")
+    parser.add_argument("--model-dir", default="models")
+    parser.add_argument("--kind", choices=KINDS, action="append", help="default: both")
+    parser.add_argument("--cls-version", default=None)
+    parser.add_argument("--seg-version", default=None)
+    parser.add_argument("--images", default=None, help="folder of sample scans (default: synthetic)")
+    parser.add_argument("--limit", type=int, default=32)
+    parser.add_argument("--atol", type=float, default=0.02, help="max allowed output difference")
+    parser.add_argument("--min-dice", type=float, default=0.98, help="min mask Dice vs Python path")
+    parser.add_argument("--register", action="store_true", help="register exports that pass parity")
+    parser.add_argument("--default", action="store_true", help="make registered exports the default")
+    args = parser.parse_args(argv)
+
+    registry = ModelRegistry.from_dir(args.model_dir, inference_only=True)
+    images = load_images(args.images, args.limit)
+    versions = {"classifier": args.cls_version, "segmenter": args.seg_version}
+    report, failed = {}, False
+
+    for kind in args.kind or KINDS:
+        model, spec = registry.get(kind, versions[kind])
+        stem, _ = os.path.splitext(spec.path)
+        out_path = f"{stem}_in_graph.keras"
+        export_model(model, spec, out_path)
+        # Parity is checked on the reloaded file, so serialization is covered too
+        exported = _LOADERS[kind](out_path, True)
+        result = check_parity(model, exported, spec, images)
+        result["path"] = out_path
+        result["passed"] = parity_ok(result, args.atol, args.min_dice)
+        failed |= not result["passed"]
+        report[f"{kind} {spec.version}"] = result
+
+        if args.register and result["passed"]:
+            _ensure_registry(registry, args.model_dir)
+            register_model(args.model_dir, kind, f"{spec.version}+graph",
+                           os.path.relpath(out_path, args.model_dir), spec.input_shape,
+                           spec.class_names or None, make_default=args.default,
+                           extra={"preprocessing": IN_GRAPH, "source_version": spec.version})
+
+    print(json.dumps(report, indent=2))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+import os
+import threading
+import weakref
+
+import numpy as np
+import tensorflow as tf
+import matplotlib
+from PIL import Image
+
+# Grad-CAM from the classification forward pass.
+# The classifier is re-exposed as a model returning (last conv feature map,
+# class probabilities). Running that under a GradientTape gives the
+# prediction and, from one backward pass to the feature map, the Grad-CAM
+# heatmaps for the predicted classes of the whole batch. There is no
+# second forward pass.
+#
+#   TUMORX_GRADCAM_LAYER    name of the layer to explain (default: the last
+#                           convolution, or a nested backbone model)
+
+CONV_LAYERS = (tf.keras.layers.Conv2D, tf.keras.layers.SeparableConv2D, tf.keras.layers.DepthwiseConv2D)
+LAYER_NAME = os.environ.get("TUMORX_GRADCAM_LAYER") or None
+
+
+def _is_feature_map(layer):
+    try:
+        return len(layer.output.shape) == 4
+    except (AttributeError, ValueError):
+        return False
+
+
+def last_conv_layer(model, name=LAYER_NAME):
+    """The layer named ``name``, else the last convolution (pooling and dropout are skipped)."""
+    if name is not None:
+        return model.get_layer(name)
+    for layer in reversed(model.layers):
+        # A nested backbone (e.g. a keras.applications model) counts as its last conv block
+        if isinstance(layer, CONV_LAYERS) or (isinstance(layer, tf.keras.Model) and _is_feature_map(layer)):
+            return layer
+    raise ValueError(f"Model {model.name!r} has no convolutional feature map for Grad-CAM.")
+
+
+_cam_models = weakref.WeakKeyDictionary()
+_cam_lock = threading.Lock()
+
+
+def _cam_model(model):
+    with _cam_lock:
+        cam_model = _cam_models.get(model)
+        if cam_model is None:
+            conv = last_conv_layer(model)
+            cam_model = tf.keras.Model(model.inputs, [conv.output, model.output])
+            _cam_models[model] = cam_model
+    return cam_model
+
+
+def forward_with_cam(model, batch, in_graph=False):
+    """Predict a batch and return (probs (N, classes), cams (N, h, w) in [0, 1])."""
+    x = tf.convert_to_tensor(batch)
+    if in_graph:
+        # Preprocessing layers of the wrapper run eagerly; the tape covers the classifier
+        for layer in model.layers[1:-1]:
+            x = layer(x)
+        model = model.layers[-1]
+    else:
+        x = tf.cast(x, tf.float32)
+    with tf.GradientTape() as tape:
+        conv, preds = _cam_model(model)(x, training=False)
+        score = tf.gather(preds, tf.argmax(preds, axis=-1), batch_dims=1)
+    grads = tape.gradient(score, conv)
+    weights = tf.reduce_mean(grads, axis=(1, 2), keepdims=True)
+    cam = tf.nn.relu(tf.reduce_sum(conv * weights, axis=-1))
+    cam = cam / (tf.reduce_max(cam, axis=(1, 2), keepdims=True) + 1e-8)
+    return preds.numpy(), cam.numpy()
+
+
+def overlay_cam(pil_image, cam, alpha=0.45, max_side=None):
+    """Blend a heatmap over the scan (jet colormap); returns an RGB PIL image."""
+    base = pil_image.convert("RGB")
+    if max_side:
+        base.thumbnail((max_side, max_side))
+    heat = Image.fromarray(np.uint8(np.clip(cam, 0, 1) * 255)).resize(base.size, Image.BILINEAR)
+    colored = matplotlib.colormaps["jet"](np.asarray(heat) / 255.0)[..., :3]
+    return Image.blend(base, Image.fromarray(np.uint8(colored * 255)), alpha)
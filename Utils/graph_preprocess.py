@@ -0,0 +1,89 @@
+import numpy as np
+import tensorflow as tf
+
+# In-graph preprocessing.
+# Exported models take raw uint8 RGB batches of any size, (N, H, W, 3),
+# and do the work of the Python preprocessors as Keras layers, so it runs
+# batched inside TF's thread pool:
+#
+#   classifier: RGB -> BGR, bilinear resize to 128x128, /255
+#   segmenter:  RGB -> gray (libpng weights, as tf.image.decode_image with
+#               channels=1 does), /255, bilinear resize to 256x256
+#
+# Registry entries for such models carry "preprocessing": "in_graph".
+
+IN_GRAPH = "in_graph"
+# ITU-R BT.709 luma, the default libpng uses for rgb -> gray
+GRAY_WEIGHTS = (0.2126, 0.7152, 0.0722)
+
+
+@tf.keras.utils.register_keras_serializable(package="tumorx")
+class ToFloat(tf.keras.layers.Layer):
+    def call(self, inputs):
+        return tf.cast(inputs, tf.float32)
+
+
+@tf.keras.utils.register_keras_serializable(package="tumorx")
+class ReverseChannels(tf.keras.layers.Layer):
+    def call(self, inputs):
+        return tf.reverse(inputs, axis=[-1])
+
+
+@tf.keras.utils.register_keras_serializable(package="tumorx")
+class RGBToGray(tf.keras.layers.Layer):
+    def call(self, inputs):
+        weights = tf.constant(GRAY_WEIGHTS, dtype=inputs.dtype)
+        return tf.reduce_sum(inputs * weights, axis=-1, keepdims=True)
+
+
+CUSTOM_OBJECTS = {"ToFloat": ToFloat, "ReverseChannels": ReverseChannels, "RGBToGray": RGBToGray}
+
+
+def is_in_graph(spec):
+    return spec is not None and spec.extra.get("preprocessing") == IN_GRAPH
+
+
+# ---------------- Wrappers ----------------
+def wrap_classifier(model, target_size):
+    h, w = target_size
+    raw = tf.keras.Input(shape=(None, None, 3), dtype="uint8", name="image_uint8")
+    x = ToFloat(name="to_float")(raw)
+    x = ReverseChannels(name="rgb_to_bgr")(x)
+    x = tf.keras.layers.Resizing(h, w, interpolation="bilinear", name="resize")(x)
+    x = tf.keras.layers.Rescaling(1.0 / 255, name="scale")(x)
+    return tf.keras.Model(raw, model(x), name=f"{model.name}_in_graph")
+
+
+def wrap_segmenter(model, target_size):
+    h, w = target_size
+    raw = tf.keras.Input(shape=(None, None, 3), dtype="uint8", name="image_uint8")
+    x = ToFloat(name="to_float")(raw)
+    x = RGBToGray(name="to_gray")(x)
+    x = tf.keras.layers.Rescaling(1.0 / 255, name="scale")(x)
+    x = tf.keras.layers.Resizing(h, w, interpolation="bilinear", name="resize")(x)
+    return tf.keras.Model(raw, model(x), name=f"{model.name}_in_graph")
+
+
+def unwrap(model):
+    """The original float-input model inside an in-graph wrapper."""
+    return model.layers[-1]
+
+
+# ---------------- Inputs ----------------
+def uint8_batches(pil_images):
+    """Group images by size into raw (N, H, W, 3) uint8 batches; yields (indices, batch)."""
+    groups = {}
+    for i, im in enumerate(pil_images):
+        groups.setdefault(im.size, []).append(i)
+    for indices in groups.values():
+        yield indices, np.stack([np.asarray(pil_images[i].convert("RGB"), dtype=np.uint8) for i in indices])
+
+
+def predict_raw(model, pil_images):
+    """Run an in-graph model over PIL images; predictions come back in input order."""
+    out = [None] * len(pil_images)
+    for indices, batch in uint8_batches(pil_images):
+        preds = model.predict(batch, verbose=0)
+        for i, p in zip(indices, preds):
+            out[i] = p
+    return np.stack(out)
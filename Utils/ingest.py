@@ -0,0 +1,39 @@
+from PIL import Image
+
+# Upload ingestion.
+# Image.open() only parses the header, so format and size are known before
+# any pixels are decoded. For JPEGs we then switch the decoder into draft
+# mode, which performs the IDCT at 1/2, 1/4 or 1/8 scale and never
+# materialises the full-resolution bitmap. Other formats decode normally.
+
+
+def _rewind(fp):
+    if hasattr(fp, "seek"):
+        fp.seek(0)
+
+
+# ---------------- Header ----------------
+def read_header(fp):
+    """Return (format, (width, height), mode) without decoding pixel data."""
+    _rewind(fp)
+    with Image.open(fp) as img:
+        info = (img.format, img.size, img.mode)
+    _rewind(fp)
+    return info
+
+
+# ---------------- Decode ----------------
+def open_image(fp, max_side=None):
+    """Decode an upload, reduced to roughly ``max_side`` when the format allows.
+
+    The result is never smaller than ``max_side`` on its shorter edge (draft
+    mode only picks power-of-two scales that keep at least the requested
+    size), so downstream resizes see the same or more detail than they need.
+    Pass ``max_side=None`` for a full-resolution decode.
+    """
+    _rewind(fp)
+    img = Image.open(fp)
+    if max_side and img.format == "JPEG" and min(img.size) > max_side:
+        img.draft(img.mode, (max_side, max_side))
+    img.load()
+    return img
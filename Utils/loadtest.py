@@ -0,0 +1,258 @@
+import argparse
+import io
+import os
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+
+import numpy as np
+
+from Utils.workers import memory_usage
+
+# Rerun load test for app.py.
+# Drives N simulated sessions through upload -> analyze -> generate report
+# with Streamlit's headless AppTest, against the synthetic stand-in models.
+# AppTest is not thread-safe (each run swaps a mock into the process-wide
+# Runtime singleton and patches global config), so runs are serialized:
+# sessions are stepped round-robin, one rerun at a time, while all of them
+# stay alive with their session state and share the cached models. The
+# latencies are therefore per-rerun cost with N live sessions, not
+# throughput under N truly simultaneous reruns.
+# AppTest cannot feed st.file_uploader, so the harness swaps it for a stub
+# that returns whatever the session put in session_state[UPLOAD_KEY].
+# Inference entry points are wrapped to count calls per session, which
+# gives inference counts per interaction. Every session and iteration
+# uploads a different synthetic scan so the shared near-duplicate index
+# (Utils/phash.py) cannot turn analyses into cache hits; with --image the
+# same file is uploaded every time, so the index is switched off.
+#
+#   python -m Utils.loadtest --sessions 20 --iterations 3
+
+SESSION_KEY = "_loadtest_session"
+UPLOAD_KEY = "_loadtest_upload"
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+
+_counts = defaultdict(Counter)
+_counts_lock = threading.Lock()
+_reports = []
+
+
+class _Upload(io.BytesIO):
+    """Minimal stand-in for streamlit's UploadedFile."""
+
+    def __init__(self, data, name, mime="image/jpeg"):
+        super().__init__(data)
+        self.name = name
+        self.type = mime
+        self.size = len(data)
+        self.file_id = name
+
+
+# ---------------- Instrumentation ----------------
+def _install_hooks():
+    import streamlit as st
+    import Utils.classification as classification
+    import Utils.segment as segment
+    import Utils.report as report
+
+    def fake_uploader(label, *args, **kwargs):
+        upload = st.session_state.get(UPLOAD_KEY)
+        if kwargs.get("accept_multiple_files"):
+            return [] if upload is None else upload if isinstance(upload, list) else [upload]
+        return upload
+
+    def counting(name, fn):
+        def wrapper(*args, **kwargs):
+            sid = st.session_state.get(SESSION_KEY)
+            with _counts_lock:
+                _counts[sid][name] += 1
+            result = fn(*args, **kwargs)
+            if name == "generate_pdf_report":
+                _reports.append(result)
+            return result
+        return wrapper
+
+    st.file_uploader = fake_uploader
+    classification.classify_image = counting("classify_image", classification.classify_image)
+    classification.classify_batch = counting("classify_batch", classification.classify_batch)
+    segment.segment_image = counting("segment_image", segment.segment_image)
+    segment.segment_images = counting("segment_images", segment.segment_images)
+    report.generate_pdf_report = counting("generate_pdf_report", report.generate_pdf_report)
+
+
+def _snapshot(sid):
+    with _counts_lock:
+        return Counter(_counts[sid])
+
+
+class _MemorySampler(threading.Thread):
+    def __init__(self, interval):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.samples = []
+        self._halt = threading.Event()
+        self._t0 = time.perf_counter()
+
+    def run(self):
+        while not self._halt.is_set():
+            self.samples.append((time.perf_counter() - self._t0, memory_usage()["rss_mb"]))
+            self._halt.wait(self.interval)
+
+    def stop(self):
+        self._halt.set()
+        self.join()
+        self.samples.append((time.perf_counter() - self._t0, memory_usage()["rss_mb"]))
+
+
+# ---------------- Sessions ----------------
+def _timed_run(at, sid, kind, records):
+    before = _snapshot(sid)
+    start = time.perf_counter()
+    at.run()
+    elapsed = time.perf_counter() - start
+    calls = _snapshot(sid) - before
+    failed = bool(at.exception)
+    records.append({"kind": kind, "latency_s": elapsed, "calls": calls, "failed": failed})
+
+
+def _session_steps(sid, app_path, scan_for, iterations, timeout, records):
+    """One simulated session; yields after each rerun so sessions can be interleaved."""
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(app_path, default_timeout=timeout)
+    at.session_state[SESSION_KEY] = sid
+    _timed_run(at, sid, "load", records)
+    yield
+
+    for i in range(iterations):
+        at.session_state[UPLOAD_KEY] = _Upload(scan_for(sid, i), f"scan_{sid}_{i}.jpg")
+        _timed_run(at, sid, "analyze", records)
+        yield
+
+        buttons = [b for b in at.button if "Generate PDF Report" in str(b.label)]
+        if not buttons:
+            records.append({"kind": "report", "latency_s": float("nan"),
+                            "calls": Counter(), "failed": True})
+            continue
+        buttons[0].click()
+        _timed_run(at, sid, "report", records)
+        yield
+
+
+def _run_sessions(sessions, app_path, scan_for, iterations, timeout):
+    records = []
+    active = [_session_steps(f"s{i}", app_path, scan_for, iterations, timeout, records)
+              for i in range(sessions)]
+    while active:
+        for steps in list(active):
+            try:
+                next(steps)
+            except StopIteration:
+                active.remove(steps)
+    return records
+
+
+# ---------------- Reporting ----------------
+def summarize(records, samples):
+    lines = []
+    by_kind = defaultdict(list)
+    for r in records:
+        by_kind[r["kind"]].append(r)
+
+    lines.append(f"{'interaction':<10} {'n':>5} {'fail':>5} {'p50 ms':>9} {'p90 ms':>9} "
+                 f"{'p99 ms':>9} {'max ms':>9}   calls per interaction")
+    for kind in ("load", "analyze", "report"):
+        rs = by_kind.get(kind, [])
+        if not rs:
+            continue
+        lat = np.array([r["latency_s"] for r in rs if not r["failed"]]) * 1000
+        fails = sum(r["failed"] for r in rs)
+        total = Counter()
+        for r in rs:
+            total.update(r["calls"])
+        calls = ", ".join(f"{k}={v / len(rs):.2f}" for k, v in sorted(total.items())) or "none"
+        if lat.size:
+            p50, p90, p99 = np.percentile(lat, [50, 90, 99])
+            lines.append(f"{kind:<10} {len(rs):>5} {fails:>5} {p50:>9.0f} {p90:>9.0f} "
+                         f"{p99:>9.0f} {lat.max():>9.0f}   {calls}")
+        else:
+            lines.append(f"{kind:<10} {len(rs):>5} {fails:>5} {'-':>9} {'-':>9} {'-':>9} {'-':>9}   {calls}")
+
+    if samples:
+        rss = np.array([m for _, m in samples])
+        lines.append("")
+        lines.append(f"process RSS: start {rss[0]:.0f} MB, peak {rss.max():.0f} MB, "
+                     f"end {rss[-1]:.0f} MB, growth {rss[-1] - rss[0]:+.0f} MB")
+        step = max(1, len(samples) // 10)
+        lines.append("  " + "  ".join(f"{t:.0f}s:{m:.0f}" for t, m in samples[::step]))
+    return "\n".join(lines)
+
+
+def run_loadtest(sessions=20, iterations=3, model_dir=None, image_path=None,
+                 app_path=APP_PATH, timeout=300, sample_interval=0.5):
+    from Utils.synthetic import build_synthetic_models, synthetic_scan, encode_image
+
+    os.environ.setdefault("MPLBACKEND", "Agg")
+    tmp = None
+    if model_dir is None:
+        tmp = tempfile.TemporaryDirectory(prefix="tumorx-loadtest-")
+        model_dir = tmp.name
+        build_synthetic_models(model_dir)
+    os.environ["TUMORX_MODEL_DIR"] = model_dir
+
+    if image_path:
+        with open(image_path, "rb") as f:
+            scan_bytes = f.read()
+        os.environ["TUMORX_PHASH"] = "0"
+
+        def scan_for(sid, iteration):
+            return scan_bytes
+    else:
+        def scan_for(sid, iteration):
+            return encode_image(synthetic_scan(1024, seed=int(sid[1:]) * iterations + iteration + 1))
+
+    _install_hooks()
+
+    # One serial warm-up session so model loading is not counted
+    from streamlit.testing.v1 import AppTest
+    AppTest.from_file(app_path, default_timeout=timeout).run()
+
+    sampler = _MemorySampler(sample_interval)
+    sampler.start()
+    records = []
+    try:
+        records = _run_sessions(sessions, app_path, scan_for, iterations, timeout)
+    finally:
+        sampler.stop()
+        for path in _reports:
+            try:
+                os.remove(path)
+            except (OSError, TypeError):
+                pass
+        if tmp is not None:
+            tmp.cleanup()
+
+    return records, sampler.samples
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Interleaved multi-session rerun load test for app.py")
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--iterations", type=int, default=3,
+                        help="upload -> analyze -> report cycles per session")
+    parser.add_argument("--model-dir", default=None,
+                        help="directory with real models (default: synthetic stand-ins)")
+    parser.add_argument("--image", default=None, help="scan to upload (default: synthetic)")
+    parser.add_argument("--timeout", type=float, default=300)
+    args = parser.parse_args(argv)
+
+    records, samples = run_loadtest(args.sessions, args.iterations, args.model_dir,
+                                    args.image, timeout=args.timeout)
+    print(f"Load test: {args.sessions} interleaved sessions x {args.iterations} iterations "
+          f"(reruns serialized; per-rerun cost)")
+    print(summarize(records, samples))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+import threading
+import zlib
+from collections import OrderedDict
+from itertools import combinations
+
+import numpy as np
+from PIL import Image
+
+# Perceptual hashing and near-duplicate lookup.
+#
+# phash(): 64-bit DCT hash. The image is reduced to 32x32 grayscale, a 2D
+# DCT-II is applied as two matrix products (batched with einsum), and the
+# 8x8 lowest frequencies are thresholded at their median. Re-encoding,
+# recompression and resizing barely move the hash.
+#
+# A hash match only nominates candidates. MRI slices share most of their
+# low-frequency structure, so distinct scans (and a scan with an extra small
+# lesion) can land within a few bits of each other; on 64 synthetic scans 45
+# of 2016 distinct pairs were within 4 bits and 3 were identical. Candidates
+# are therefore confirmed on a 64x64 grayscale pixel signature: re-encoded
+# and resized copies differ by at most ~6 levels per pixel there, distinct
+# scans by 19 or more (python -m Utils.bench phash). Signatures are kept
+# zlib-compressed (~2 KB).
+#
+# PHashIndex: multi-index hashing. Each hash is split into m wide chunks
+# (3 chunks of 21-22 bits by default). By the pigeonhole principle a hash
+# within d bits of the query differs in at most d // m bits on at least one
+# chunk, so a lookup probes every key within that radius of each chunk
+# (3 x 254 keys for d = 8) and verifies the candidates. Probing is one NumPy
+# gather into a dense per-chunk bucket-head array and verification is a
+# vectorized XOR + popcount. With ~2M keys per chunk the buckets stay nearly
+# empty, so the probe count, not the index size, sets the lookup cost:
+# ~40 us at 1k entries, ~60 us at 300k (python -m Utils.bench phash).
+
+HASH_SIZE = 8
+DCT_SIZE = 32
+SIGNATURE_SIZE = 64
+
+
+def _dct_matrix(n):
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    m = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+    m[0] /= np.sqrt(2.0)
+    return m.astype(np.float32)
+
+
+_DCT = _dct_matrix(DCT_SIZE)
+_BIT_WEIGHTS = np.left_shift(np.uint64(1), np.arange(HASH_SIZE * HASH_SIZE - 1, -1, -1, dtype=np.uint64))
+
+
+# ---------------- Hashing ----------------
+def _prepare(pil_image):
+    img = pil_image.convert("L").resize((DCT_SIZE, DCT_SIZE), Image.LANCZOS)
+    return np.asarray(img, dtype=np.float32)
+
+
+def phash_batch(pil_images):
+    """64-bit perceptual hashes (uint64 array) for a list of PIL images."""
+    pixels = np.stack([_prepare(im) for im in pil_images])          # (N, 32, 32)
+    coeffs = np.einsum("ij,njk,lk->nil", _DCT, pixels, _DCT)        # D @ X @ D.T
+    low = coeffs[:, :HASH_SIZE, :HASH_SIZE].reshape(len(pixels), -1)
+    bits = low > np.median(low[:, 1:], axis=1, keepdims=True)       # DC term excluded from median
+    return (bits.astype(np.uint64) * _BIT_WEIGHTS).sum(axis=1, dtype=np.uint64)
+
+
+def phash(pil_image):
+    return int(phash_batch([pil_image])[0])
+
+
+def hamming(a, b):
+    return (int(a) ^ int(b)).bit_count()
+
+
+# ---------------- Confirmation ----------------
+def pixel_signature(pil_image):
+    """64x64 grayscale box-filtered thumbnail as bytes (4 KB)."""
+    img = pil_image.convert("L").resize((SIGNATURE_SIZE, SIGNATURE_SIZE), Image.BOX)
+    return img.tobytes()
+
+
+def compress_signature(signature):
+    return zlib.compress(signature, 6)
+
+
+def decompress_signature(data):
+    return zlib.decompress(data)
+
+
+def signature_diff(a, b):
+    """Largest per-pixel difference between two pixel signatures (0-255)."""
+    a = np.frombuffer(a, dtype=np.uint8).astype(np.int16)
+    b = np.frombuffer(b, dtype=np.uint8).astype(np.int16)
+    return int(np.abs(a - b).max())
+
+
+# ---------------- Index ----------------
+_POPCOUNT8 = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def _popcount(values):
+    return _POPCOUNT8[values.view(np.uint8)].reshape(len(values), 8).sum(axis=1)
+
+
+def _grown(array, size):
+    out = np.empty(size, dtype=array.dtype)
+    out[:len(array)] = array
+    return out
+
+
+class PHashIndex:
+    """Oldest entries are evicted beyond ``max_entries`` or ``max_bytes`` (as reported to add())."""
+
+    def __init__(self, max_distance=8, max_entries=None, max_bytes=None, bits=HASH_SIZE * HASH_SIZE, chunks=3):
+        self.max_distance = max_distance
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        if not 0 < chunks <= bits:
+            raise ValueError("chunks must be between 1 and the hash length.")
+        radius = max_distance // chunks
+        # Chunk boundaries as (shift, mask, flips); the first bits % chunks chunks get one
+        # extra bit. flips are the XOR masks that reach every key within radius of a key.
+        self._chunks = []
+        base, extra = divmod(bits, chunks)
+        shift = bits
+        for c in range(chunks):
+            width = base + (1 if c < extra else 0)
+            shift -= width
+            flips = np.array([sum(1 << b for b in combo) for r in range(radius + 1)
+                              for combo in combinations(range(width), r)], dtype=np.int64)
+            self._chunks.append((shift, (1 << width) - 1, flips))
+        # Buckets as linked lists of slots: a dense head array per chunk (one int32 per
+        # possible key, 32 MB in all for 64-bit hashes) and a next-slot array per chunk
+        self._heads = [np.full(mask + 1, -1, dtype=np.int32) for _, mask, _ in self._chunks]
+        self._next = [np.empty(0, dtype=np.int32) for _ in self._chunks]
+        self._hashes = np.empty(0, dtype=np.uint64)
+        self._ids = np.empty(0, dtype=np.int64)
+        self._payloads = []
+        self._free = []
+        self._entries = OrderedDict()   # id -> (slot, nbytes)
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _keys(self, h):
+        return [(h >> shift) & mask for shift, mask, _ in self._chunks]
+
+    def _slot(self):
+        if self._free:
+            return self._free.pop()
+        slot = len(self._payloads)
+        if slot == len(self._hashes):
+            size = max(1024, 2 * slot)
+            self._hashes = _grown(self._hashes, size)
+            self._ids = _grown(self._ids, size)
+            self._next = [_grown(nxt, size) for nxt in self._next]
+        self._payloads.append(None)
+        return slot
+
+    def add(self, h, payload, nbytes=0):
+        h = int(h)
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            slot = self._slot()
+            self._hashes[slot], self._ids[slot], self._payloads[slot] = h, entry_id, payload
+            for heads, nxt, key in zip(self._heads, self._next, self._keys(h)):
+                nxt[slot], heads[key] = heads[key], slot
+            self._entries[entry_id] = (slot, nbytes)
+            self.nbytes += nbytes
+            while self._entries and ((self.max_entries is not None and len(self._entries) > self.max_entries)
+                                     or (self.max_bytes is not None and self.nbytes > self.max_bytes)):
+                self._remove(next(iter(self._entries)))
+        return entry_id
+
+    def remove(self, entry_id):
+        with self._lock:
+            self._remove(entry_id)
+
+    def _remove(self, entry_id):
+        slot, nbytes = self._entries.pop(entry_id)
+        self.nbytes -= nbytes
+        for heads, nxt, key in zip(self._heads, self._next, self._keys(int(self._hashes[slot]))):
+            prev, cur = -1, heads[key]
+            while cur != slot:
+                prev, cur = cur, nxt[cur]
+            if prev < 0:
+                heads[key] = nxt[slot]
+            else:
+                nxt[prev] = nxt[slot]
+        self._payloads[slot] = None
+        self._free.append(slot)
+
+    def query(self, h, max_distance=None):
+        """Entries within ``max_distance`` bits, nearest first, as (distance, payload) pairs."""
+        h = int(h)
+        max_distance = self.max_distance if max_distance is None else min(max_distance, self.max_distance)
+        with self._lock:
+            found = []
+            for heads, nxt, key, (_, _, flips) in zip(self._heads, self._next, self._keys(h), self._chunks):
+                slots = heads[key ^ flips]
+                slots = slots[slots >= 0]
+                while slots.size:
+                    found.append(slots)
+                    slots = nxt[slots]
+                    slots = slots[slots >= 0]
+            if not found:
+                return []
+            slots = np.unique(np.concatenate(found))
+            dist = _popcount(self._hashes[slots] ^ np.uint64(h))
+            keep = dist <= max_distance
+            slots, dist = slots[keep], dist[keep]
+            order = np.lexsort((-self._ids[slots], dist))     # nearest, then most recent
+            return [(int(dist[i]), self._payloads[slots[i]]) for i in order]
@@ -0,0 +1,153 @@
+import cProfile
+import functools
+import io
+import os
+import pstats
+import random
+import shutil
+import threading
+import time
+import tracemalloc
+
+# On-demand profiling for the inference and report paths.
+#
+#   TUMORX_PROFILE       fraction of calls to profile (0 = off, 1 = every call)
+#   TUMORX_PROFILE_DIR   output directory (default: ./profiles)
+#   TUMORX_PROFILE_KEEP  number of captures to keep before rotating (default: 50)
+#   TUMORX_PROFILE_TF    also record a TensorFlow profiler trace (default: 1)
+#
+# Each sampled call writes <name>-<timestamp>-<pid>.prof (cProfile stats),
+# a matching .mem.txt (tracemalloc peak and top allocation sites) and,
+# when enabled, a -tf/ trace directory viewable in TensorBoard.
+# Settings can be changed at runtime with configure() (e.g. from an admin
+# toggle). Only one call is profiled at a time; concurrent calls run as-is.
+
+
+def _env_float(name, default):
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+_config = {
+    "rate": _env_float("TUMORX_PROFILE", 0.0),
+    "out_dir": os.environ.get("TUMORX_PROFILE_DIR", "profiles"),
+    "keep": int(_env_float("TUMORX_PROFILE_KEEP", 50)),
+    "tf_trace": os.environ.get("TUMORX_PROFILE_TF", "1") not in ("0", "false", "False", ""),
+}
+_lock = threading.Lock()
+
+
+# ---------------- Configuration ----------------
+def configure(rate=None, out_dir=None, keep=None, tf_trace=None):
+    if rate is not None:
+        _config["rate"] = max(0.0, min(1.0, float(rate)))
+    if out_dir is not None:
+        _config["out_dir"] = out_dir
+    if keep is not None:
+        _config["keep"] = int(keep)
+    if tf_trace is not None:
+        _config["tf_trace"] = bool(tf_trace)
+
+
+def get_config():
+    return dict(_config)
+
+
+# ---------------- Output rotation ----------------
+def _rotate(out_dir, keep):
+    captures = {}
+    for entry in os.listdir(out_dir):
+        # Group the .prof/.mem.txt/-tf outputs of one capture by their stem
+        stem = entry.split(".")[0]
+        if stem.endswith("-tf"):
+            stem = stem[:-3]
+        path = os.path.join(out_dir, entry)
+        captures.setdefault(stem, []).append(path)
+    if len(captures) <= keep:
+        return
+    ordered = sorted(captures, key=lambda s: max(os.path.getmtime(p) for p in captures[s]))
+    for stem in ordered[:len(captures) - keep]:
+        for path in captures[stem]:
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+
+def _write_memory_report(path, snapshot, peak):
+    lines = [f"tracemalloc peak: {peak / 1024 / 1024:.2f} MB", "", "Top allocation sites:"]
+    for stat in snapshot.statistics("lineno")[:25]:
+        lines.append(str(stat))
+    with open(path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+# ---------------- Capture ----------------
+def _start_tf_trace(logdir):
+    try:
+        import tensorflow as tf
+        tf.profiler.experimental.start(logdir)
+        return tf
+    except Exception:
+        return None
+
+
+def _profile_call(name, fn, args, kwargs):
+    out_dir = _config["out_dir"]
+    os.makedirs(out_dir, exist_ok=True)
+    stem = f"{name}-{time.strftime('%Y%m%d_%H%M%S')}_{int(time.time() * 1000) % 1000:03d}-{os.getpid()}"
+    base = os.path.join(out_dir, stem)
+
+    tf = _start_tf_trace(base + "-tf") if _config["tf_trace"] else None
+    started_tracemalloc = not tracemalloc.is_tracing()
+    if started_tracemalloc:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            profiler.disable()
+    finally:
+        _, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot()
+        if started_tracemalloc:
+            tracemalloc.stop()
+        if tf is not None:
+            try:
+                tf.profiler.experimental.stop()
+            except Exception:
+                pass
+        profiler.dump_stats(base + ".prof")
+        _write_memory_report(base + ".mem.txt", snapshot, peak)
+        _rotate(out_dir, _config["keep"])
+
+
+def profiled(name):
+    """Decorator: profile a sampled fraction of calls to the wrapped function."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            rate = _config["rate"]
+            if rate <= 0 or random.random() >= rate or not _lock.acquire(blocking=False):
+                return fn(*args, **kwargs)
+            try:
+                return _profile_call(name, fn, args, kwargs)
+            finally:
+                _lock.release()
+        return wrapper
+    return decorator
+
+
+def summarize(prof_path, limit=20):
+    """Return the top cumulative-time entries of a saved .prof file as text."""
+    buf = io.StringIO()
+    pstats.Stats(prof_path, stream=buf).sort_stats("cumulative").print_stats(limit)
+    return buf.getvalue()
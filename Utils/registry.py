@@ -0,0 +1,246 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from Utils.classification import load_classification_model, class_names as DEFAULT_CLASS_NAMES, IMG_SIZE as CLS_IMG_SIZE
+from Utils.segment import load_segmentation_model, IMG_SIZE as SEG_IMG_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Versioned model registry.
+# <model_dir>/registry.json lists every model version that may be served:
+#
+#   {
+#     "default": {"classifier": "2.1.0", "segmenter": "2.1.0"},
+#     "models": [
+#       {"kind": "classifier", "version": "2.1.0", "path": "brain_tumor_model.keras",
+#        "input_shape": [128, 128, 3], "class_names": ["glioma", ...], "sha256": "..."},
+#       {"kind": "segmenter", "version": "2.1.0", "path": "final_model.keras",
+#        "input_shape": [256, 256, 1], "sha256": "..."}
+#     ]
+#   }
+#
+# Paths are relative to the registry file; sha256 is optional. Models load
+# on first use and are kept in an LRU bounded by memory_budget_mb; the
+# least recently used non-default versions are dropped when a new one does
+# not fit (default versions stay pinned).
+# Without a registry.json the two legacy model files are served as 2.1.0.
+
+KINDS = ("classifier", "segmenter")
+REGISTRY_FILE = "registry.json"
+LEGACY_VERSION = "2.1.0"
+
+_LOADERS = {
+    "classifier": load_classification_model,
+    "segmenter": load_segmentation_model,
+}
+
+
+@dataclass(frozen=True)
+class ModelSpec:
+    kind: str
+    version: str
+    path: str
+    input_shape: tuple
+    class_names: tuple = ()
+    sha256: str = None
+    extra: dict = field(default_factory=dict, compare=False, hash=False)
+
+    @property
+    def key(self):
+        return (self.kind, self.version)
+
+
+def _file_sha256(path, chunk_size=1 << 20):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def model_nbytes(model):
+    total = 0
+    for w in model.weights:
+        dtype = getattr(w.dtype, "as_numpy_dtype", w.dtype)
+        try:
+            itemsize = np.dtype(dtype).itemsize
+        except TypeError:
+            itemsize = 4
+        n = 1
+        for d in w.shape:
+            n *= int(d)
+        total += n * itemsize
+    return total
+
+
+# ---------------- Registry ----------------
+class ModelRegistry:
+    def __init__(self, specs, defaults, memory_budget_mb=2048, inference_only=True, on_load=None):
+        self.specs = {s.key: s for s in specs}
+        self.defaults = dict(defaults)
+        self.memory_budget = memory_budget_mb * 1024 * 1024
+        self.inference_only = inference_only
+        self.on_load = on_load          # called as on_load(spec, model), e.g. warm-up
+        self.load_times = {}
+        self._cache = OrderedDict()     # key -> (model, nbytes)
+        self._lock = threading.Lock()
+        self._key_locks = {k: threading.Lock() for k in self.specs}
+        for kind in KINDS:
+            if (kind, self.defaults.get(kind)) not in self.specs:
+                raise ValueError(f"Default {kind} version {self.defaults.get(kind)!r} is not registered.")
+
+    @classmethod
+    def from_dir(cls, model_dir, **kwargs):
+        reg_path = os.path.join(model_dir, REGISTRY_FILE)
+        if not os.path.exists(reg_path):
+            specs = [
+                ModelSpec("classifier", LEGACY_VERSION, os.path.join(model_dir, "brain_tumor_model.keras"),
+                          (*CLS_IMG_SIZE, 3), tuple(DEFAULT_CLASS_NAMES)),
+                ModelSpec("segmenter", LEGACY_VERSION, os.path.join(model_dir, "final_model.keras"),
+                          (*SEG_IMG_SIZE, 1)),
+            ]
+            return cls(specs, {k: LEGACY_VERSION for k in KINDS}, **kwargs)
+
+        with open(reg_path) as f:
+            data = json.load(f)
+        specs = []
+        for entry in data["models"]:
+            kind = entry["kind"]
+            if kind not in KINDS:
+                raise ValueError(f"Unknown model kind in registry: {kind!r}")
+            names = entry.get("class_names")
+            if kind == "classifier" and not names:
+                names = DEFAULT_CLASS_NAMES
+            specs.append(ModelSpec(
+                kind=kind,
+                version=str(entry["version"]),
+                path=os.path.join(model_dir, entry["path"]),
+                input_shape=tuple(entry["input_shape"]),
+                class_names=tuple(names or ()),
+                sha256=entry.get("sha256"),
+                extra={k: v for k, v in entry.items()
+                       if k not in ("kind", "version", "path", "input_shape", "class_names", "sha256")},
+            ))
+        return cls(specs, data["default"], **kwargs)
+
+    # ----- lookup -----
+    def versions(self, kind):
+        return sorted(v for k, v in self.specs if k == kind)
+
+    def spec(self, kind, version=None):
+        version = version or self.defaults[kind]
+        try:
+            return self.specs[(kind, version)]
+        except KeyError:
+            raise KeyError(f"No {kind} model registered with version {version!r}.") from None
+
+    def loaded(self):
+        with self._lock:
+            return {key: nbytes for key, (_, nbytes) in self._cache.items()}
+
+    # ----- loading -----
+    def get(self, kind, version=None):
+        """Return (model, spec), loading the version on first use."""
+        spec = self.spec(kind, version)
+        with self._lock:
+            if spec.key in self._cache:
+                self._cache.move_to_end(spec.key)
+                return self._cache[spec.key][0], spec
+
+        # One loader per version; other versions can load concurrently
+        with self._key_locks[spec.key]:
+            with self._lock:
+                if spec.key in self._cache:
+                    self._cache.move_to_end(spec.key)
+                    return self._cache[spec.key][0], spec
+            model = self._load(spec)
+            nbytes = model_nbytes(model)
+            with self._lock:
+                self._cache[spec.key] = (model, nbytes)
+                self._evict(keep=spec.key)
+        return model, spec
+
+    def _load(self, spec):
+        start = time.perf_counter()
+        if spec.sha256:
+            digest = _file_sha256(spec.path)
+            if digest != spec.sha256:
+                raise ValueError(f"Checksum mismatch for {spec.kind} {spec.version}: "
+                                 f"expected {spec.sha256}, got {digest}.")
+        model = _LOADERS[spec.kind](spec.path, self.inference_only)
+        self.load_times[spec.key] = time.perf_counter() - start
+        if self.on_load is not None:
+            self.on_load(spec, model)
+        logger.info("Loaded %s %s in %.2fs", spec.kind, spec.version, self.load_times[spec.key])
+        return model
+
+    def _evict(self, keep):
+        used = sum(nbytes for _, nbytes in self._cache.values())
+        for key in list(self._cache):
+            if used <= self.memory_budget:
+                break
+            if key == keep or self.defaults.get(key[0]) == key[1]:
+                continue
+            _, nbytes = self._cache.pop(key)
+            used -= nbytes
+            logger.info("Evicted %s %s from model cache", *key)
+
+
+def register_model(model_dir, kind, version, path, input_shape, class_names=None, make_default=False,
+                   extra=None):
+    """Add (or replace) an entry in <model_dir>/registry.json, computing its checksum."""
+    reg_path = os.path.join(model_dir, REGISTRY_FILE)
+    if os.path.exists(reg_path):
+        with open(reg_path) as f:
+            data = json.load(f)
+    else:
+        data = {"default": {}, "models": []}
+    entry = {
+        "kind": kind,
+        "version": str(version),
+        "path": path,
+        "input_shape": list(input_shape),
+        "sha256": _file_sha256(os.path.join(model_dir, path)),
+    }
+    if class_names:
+        entry["class_names"] = list(class_names)
+    entry.update(extra or {})
+    data["models"] = [m for m in data["models"]
+                      if not (m["kind"] == kind and str(m["version"]) == str(version))] + [entry]
+    if make_default or kind not in data["default"]:
+        data["default"][kind] = str(version)
+    with open(reg_path, "w") as f:
+        json.dump(data, f, indent=2)
+    return entry
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Register a model version in <model_dir>/registry.json")
+    parser.add_argument("kind", choices=KINDS)
+    parser.add_argument("version")
+    parser.add_argument("path", help="model file, relative to model_dir")
+    parser.add_argument("--model-dir", default="models")
+    parser.add_argument("--input-shape", required=True, help="e.g. 128,128,3")
+    parser.add_argument("--class-names", default=None, help="comma-separated, classifier only")
+    parser.add_argument("--default", action="store_true", help="make this the default version")
+    args = parser.parse_args(argv)
+
+    entry = register_model(args.model_dir, args.kind, args.version, args.path,
+                           [int(d) for d in args.input_shape.split(",")],
+                           args.class_names.split(",") if args.class_names else None,
+                           make_default=args.default)
+    print(json.dumps(entry, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,11 @@
 import os
 import io
+import time
 import uuid
+import logging
+from functools import lru_cache
 from datetime import datetime
+from xml.sax.saxutils import escape
 from PIL import Image as PILImage
 from reportlab.lib.pagesizes import letter
 from reportlab.lib import colors
@@ -11,6 +15,21 @@ from reportlab.platypus import (
     SimpleDocTemplate, Paragraph, Spacer, Image as RLImage,
     Table, TableStyle, PageBreak
 )
+from Utils.profiling import profiled
+
+logger = logging.getLogger(__name__)
+
+# ---------- Embedded image settings ----------
+# Images are resampled to the pixel size they occupy on the page at
+# "dpi" and stored as JPEG ("jpeg_quality") or PNG. format="original"
+# embeds the full-resolution lossless PNG as older versions did.
+REPORT_IMAGE_OPTIONS = {
+    "dpi": int(os.environ.get("TUMORX_REPORT_DPI", "150")),
+    "format": os.environ.get("TUMORX_REPORT_IMAGE_FORMAT", "jpeg").lower(),
+    "jpeg_quality": int(os.environ.get("TUMORX_REPORT_JPEG_QUALITY", "85")),
+}
+# Printed width and height of the scan, overlay and Grad-CAM images
+SCAN_IMAGE_PT = 220
 
 # ---------- Helper: tumor info database (expandable) ----------
 _TUMOR_DB = {
@@ -93,18 +112,74 @@ _TUMOR_DB = {
 
 
 # ---------- Utility functions ----------
-def _pil_or_array_to_tempfile(img_obj, tmp_name):
-    if img_obj is None:
-        return None
+def _to_pil(img_obj):
     if isinstance(img_obj, PILImage.Image):
-        img = img_obj
+        return img_obj
+    try:
+        return PILImage.fromarray(img_obj)
+    except Exception:
+        raise ValueError("Unsupported image format for PDF embedding.")
+
+
+def _encode_for_pdf(img, width_pt, height_pt, options, keep_alpha=False):
+    """Resample ``img`` to its printed size and encode it; returns the encoded bytes."""
+    fmt = options.get("format", "jpeg")
+    if fmt != "original":
+        dpi = options.get("dpi", 150)
+        px = (max(1, round(width_pt / 72 * dpi)), max(1, round(height_pt / 72 * dpi)))
+        # Only ever downscale
+        if img.width > px[0] or img.height > px[1]:
+            img = img.resize(px, PILImage.LANCZOS)
+
+    buf = io.BytesIO()
+    if fmt == "jpeg" and not keep_alpha:
+        if img.mode in ("RGBA", "LA", "P"):
+            rgba = img.convert("RGBA")
+            img = PILImage.new("RGB", rgba.size, (255, 255, 255))
+            img.paste(rgba, mask=rgba.split()[-1])
+        elif img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+        img.save(buf, format="JPEG", quality=options.get("jpeg_quality", 85), optimize=True)
     else:
-        try:
-            img = PILImage.fromarray(img_obj)
-        except Exception:
-            raise ValueError("Unsupported image format for PDF embedding.")
-    img.save(tmp_name, format="PNG")
-    return tmp_name
+        img.save(buf, format="PNG", optimize=fmt != "original")
+    return buf.getvalue()
+
+
+def scan_image_side(options=None):
+    """Pixels per side scan images are resampled to in the report; None if embedded as-is."""
+    options = options or REPORT_IMAGE_OPTIONS
+    if options.get("format", "jpeg") == "original":
+        return None
+    return round(SCAN_IMAGE_PT / 72 * options.get("dpi", 150))
+
+
+def _pil_or_array_to_stream(img_obj, width_pt, height_pt, options=None):
+    if img_obj is None:
+        return None
+    data = _encode_for_pdf(_to_pil(img_obj), width_pt, height_pt, options or REPORT_IMAGE_OPTIONS)
+    return io.BytesIO(data)
+
+
+@lru_cache(maxsize=4)
+def _logo_bytes(path, mtime, width_pt, height_pt, dpi, fmt):
+    # Logo keeps its transparency, so it is always stored as PNG
+    with PILImage.open(path) as img:
+        img.load()
+        return _encode_for_pdf(img, width_pt, height_pt, {"dpi": dpi, "format": fmt}, keep_alpha=True)
+
+
+def _logo_stream(width_pt, height_pt, options):
+    for candidate in ("logo.png", "tumorx_logo.png", "logo.jpg"):
+        if os.path.exists(candidate):
+            data = _logo_bytes(os.path.abspath(candidate), os.path.getmtime(candidate),
+                               width_pt, height_pt, options.get("dpi", 150), options.get("format", "jpeg"))
+            return io.BytesIO(data)
+    return None
+
+
+def new_report_id(now=None):
+    now = now or datetime.now()
+    return f"TX-{now.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:6].upper()}"
 
 
 def _risk_assessment(class_label, confidence):
@@ -123,26 +198,8 @@ def _risk_assessment(class_label, confidence):
     return "LOW - Monitor and consult if symptoms progress"
 
 
-# ---------- Main PDF generator ----------
-def generate_pdf_report(class_label, confidence, image, segmented_img):
-    now = datetime.now()
-    ts = now.strftime("%B %d, %Y at %H:%M:%S")
-    report_id = f"TX-{now.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:6].upper()}"
-    model_version = "TumorX v2.1.0"
-
-    # confidence scale
-    try:
-        confidence_val = float(confidence)
-    except Exception:
-        confidence_val = 0.0
-    confidence_pct = confidence_val * 100 if confidence_val <= 1.05 else confidence_val
-
-    risk_text = _risk_assessment(class_label, confidence_pct)
-
-    out_name = f"TumorX_Report_{now.strftime('%Y%m%d_%H%M%S')}.pdf"
-    pdf_path = os.path.join(os.getcwd(), out_name)
-
-    # ---------- Styles ----------
+# ---------- Shared report building blocks ----------
+def _styles():
     styles = getSampleStyleSheet()
     title_style = ParagraphStyle(
         "Title",
@@ -177,24 +234,20 @@ def generate_pdf_report(class_label, confidence, image, segmented_img):
         leading=14,
         alignment=TA_JUSTIFY
     )
+    return title_style, subtitle_style, section_title_style, normal_style
 
-    flow = []
 
-    # ---------- Header (Logo + Title Block) ----------
-    logo_path = None
-    for candidate in ("logo.png", "tumorx_logo.png", "logo.jpg"):
-        if os.path.exists(candidate):
-            logo_path = candidate
-            break
+def _append_header(flow, title, ts, model_version, report_id, image_options, title_style, subtitle_style):
+    logo = _logo_stream(130, 70, image_options)
 
-    if logo_path:
-        rl_logo = RLImage(logo_path, width=130, height=70)
+    if logo is not None:
+        rl_logo = RLImage(logo, width=130, height=70)
         rl_logo.hAlign = "CENTER"
         flow.append(Spacer(1, 24))
         flow.append(rl_logo)
         flow.append(Spacer(1, 18))
 
-    flow.append(Paragraph("AI-Powered Brain Tumor Detection & Analysis", title_style))
+    flow.append(Paragraph(title, title_style))
     flow.append(Spacer(1, 6))
     flow.append(Paragraph(f"<b>Report Generated:</b> {ts}", subtitle_style))
     flow.append(Paragraph(f"<b>Model Version:</b> {model_version}", subtitle_style))
@@ -203,72 +256,8 @@ def generate_pdf_report(class_label, confidence, image, segmented_img):
     flow.append(Paragraph("<hr width='100%'/>", subtitle_style))
     flow.append(Spacer(1, 24))
 
-    # ---------- MRI Scan Analysis ----------
-    flow.append(Paragraph("MRI SCAN ANALYSIS", section_title_style))
-    flow.append(Spacer(1, 12))
-
-    tmp_files = []
-    try:
-        tmp_orig = f"tmp_orig_{uuid.uuid4().hex[:8]}.png"
-        tmp_seg = f"tmp_seg_{uuid.uuid4().hex[:8]}.png"
-        _pil_or_array_to_tempfile(image, tmp_orig)
-        tmp_files.append(tmp_orig)
-
-        if segmented_img is not None:
-            _pil_or_array_to_tempfile(segmented_img, tmp_seg)
-            tmp_files.append(tmp_seg)
-        else:
-            tmp_seg = None
-    except Exception:
-        tmp_orig = None
-        tmp_seg = None
-
-    imgs = []
-    if tmp_orig and os.path.exists(tmp_orig):
-        img1 = RLImage(tmp_orig, width=220, height=220)
-        imgs.append(img1)
-    else:
-        imgs.append(Paragraph("Original MRI (image not available)", normal_style))
-
-    if tmp_seg and os.path.exists(tmp_seg):
-        img2 = RLImage(tmp_seg, width=220, height=220)
-        imgs.append(img2)
-    else:
-        imgs.append(Paragraph("AI Segmentation (image not available)", normal_style))
-
-    img_table = Table([[imgs[0], imgs[1]]], colWidths=[260, 260])
-    img_table.setStyle(TableStyle([
-        ("VALIGN", (0,0), (-1,-1), "TOP"),
-        ("ALIGN", (0,0), (-1,-1), "CENTER"),
-        ("BOX", (0,0), (-1,-1), 0.5, colors.lightgrey),
-        ("BOTTOMPADDING", (0,0), (-1,-1), 12),
-    ]))
-    flow.append(img_table)
-    flow.append(Spacer(1, 24))
-
-    # ---------- AI Diagnostic Results ----------
-    flow.append(Paragraph("AI DIAGNOSTIC RESULTS", section_title_style))
-    flow.append(Spacer(1, 12))
-
-    diag_table_data = [
-        ["Classification Result", f"{class_label}"],
-        ["Confidence Level", f"{confidence_pct:.2f}%"],
-        ["Risk Assessment", f"{risk_text}"]
-    ]
-    diag_table = Table(diag_table_data, colWidths=[160, 360])
-    diag_table.setStyle(TableStyle([
-        ("VALIGN", (0,0), (-1,-1), "MIDDLE"),
-        ("INNERGRID", (0,0), (-1,-1), 0.25, colors.grey),
-        ("BOX", (0,0), (-1,-1), 0.5, colors.grey),
-        ("BACKGROUND", (0,0), (0,-1), colors.HexColor("#f3f4f6")),
-    ]))
-    flow.append(diag_table)
-    flow.append(Spacer(1, 24))
-
-    # ---------- Detailed Medical Info ----------
-    flow.append(Paragraph("DETAILED MEDICAL INFORMATION", section_title_style))
-    flow.append(Spacer(1, 12))
 
+def _append_tumor_info(flow, class_label, normal_style):
     info = _TUMOR_DB.get(class_label.lower(), None)
     if not info:
         flow.append(Paragraph(
@@ -301,8 +290,8 @@ def generate_pdf_report(class_label, confidence, image, segmented_img):
             flow.append(Spacer(1,6))
             flow.append(Paragraph(f"<b>Prevalence:</b> {info['prevalence']}", normal_style))
 
-    flow.append(PageBreak())  # start next big section on new page
 
+def _append_reference_and_disclaimers(flow, ts, section_title_style, subtitle_style, normal_style):
     # ---------- Reference Guide ----------
     flow.append(Paragraph("BRAIN TUMOR REFERENCE GUIDE", section_title_style))
     flow.append(Spacer(1, 12))
@@ -339,18 +328,230 @@ def generate_pdf_report(class_label, confidence, image, segmented_img):
     flow.append(Spacer(1, 8))
     flow.append(Paragraph(f"Generated on {ts}", subtitle_style))
 
+
+# ---------- Main PDF generator ----------
+@profiled("generate_pdf_report")
+def generate_pdf_report(class_label, confidence, image, segmented_img, model_version=None,
+                        segmentation_note=None, image_options=None, report_id=None,
+                        saliency_img=None, saliency_label=None):
+    build_start = time.perf_counter()
+    image_options = image_options or REPORT_IMAGE_OPTIONS
+    now = datetime.now()
+    ts = now.strftime("%B %d, %Y at %H:%M:%S")
+    report_id = report_id or new_report_id(now)
+    model_version = model_version or "TumorX v2.1.0"
+
+    # confidence scale
+    try:
+        confidence_val = float(confidence)
+    except Exception:
+        confidence_val = 0.0
+    confidence_pct = confidence_val * 100 if confidence_val <= 1.05 else confidence_val
+
+    risk_text = _risk_assessment(class_label, confidence_pct)
+
+    out_name = f"TumorX_Report_{now.strftime('%Y%m%d_%H%M%S')}.pdf"
+    pdf_path = os.path.join(os.getcwd(), out_name)
+
+    title_style, subtitle_style, section_title_style, normal_style = _styles()
+
+    flow = []
+
+    # ---------- Header (Logo + Title Block) ----------
+    _append_header(flow, "AI-Powered Brain Tumor Detection & Analysis", ts, model_version,
+                   report_id, image_options, title_style, subtitle_style)
+
+    # ---------- MRI Scan Analysis ----------
+    flow.append(Paragraph("MRI SCAN ANALYSIS", section_title_style))
+    flow.append(Spacer(1, 12))
+
+    try:
+        orig_stream = _pil_or_array_to_stream(image, SCAN_IMAGE_PT, SCAN_IMAGE_PT, image_options)
+        seg_stream = _pil_or_array_to_stream(segmented_img, SCAN_IMAGE_PT, SCAN_IMAGE_PT, image_options)
+    except Exception:
+        orig_stream = None
+        seg_stream = None
+
+    imgs = []
+    if orig_stream is not None:
+        img1 = RLImage(orig_stream, width=SCAN_IMAGE_PT, height=SCAN_IMAGE_PT)
+        imgs.append(img1)
+    else:
+        imgs.append(Paragraph("Original MRI (image not available)", normal_style))
+
+    if seg_stream is not None:
+        img2 = RLImage(seg_stream, width=SCAN_IMAGE_PT, height=SCAN_IMAGE_PT)
+        imgs.append(img2)
+    elif segmentation_note:
+        imgs.append(Paragraph(f"AI Segmentation skipped: {escape(segmentation_note)}.", normal_style))
+    else:
+        imgs.append(Paragraph("AI Segmentation (image not available)", normal_style))
+
+    img_table = Table([[imgs[0], imgs[1]]], colWidths=[260, 260])
+    img_table.setStyle(TableStyle([
+        ("VALIGN", (0,0), (-1,-1), "TOP"),
+        ("ALIGN", (0,0), (-1,-1), "CENTER"),
+        ("BOX", (0,0), (-1,-1), 0.5, colors.lightgrey),
+        ("BOTTOMPADDING", (0,0), (-1,-1), 12),
+    ]))
+    flow.append(img_table)
+    flow.append(Spacer(1, 24))
+
+    # ---------- Classifier attention (Grad-CAM, computed with the prediction) ----------
+    try:
+        saliency_stream = _pil_or_array_to_stream(saliency_img, SCAN_IMAGE_PT, SCAN_IMAGE_PT, image_options)
+    except Exception:
+        saliency_stream = None
+    if saliency_stream is not None:
+        saliency = RLImage(saliency_stream, width=SCAN_IMAGE_PT, height=SCAN_IMAGE_PT)
+        saliency_table = Table([[saliency, Paragraph(
+            f"<b>Classifier attention (Grad-CAM)</b><br/>Warmer colours mark the regions that most "
+            f"influenced the <b>{saliency_label or class_label}</b> prediction. This shows what the model relied on; "
+            f"it is not a tumor boundary.", normal_style)]], colWidths=[260, 260])
+        saliency_table.setStyle(TableStyle([
+            ("VALIGN", (0,0), (-1,-1), "MIDDLE"),
+            ("ALIGN", (0,0), (0,-1), "CENTER"),
+            ("BOX", (0,0), (-1,-1), 0.5, colors.lightgrey),
+            ("BOTTOMPADDING", (0,0), (-1,-1), 12),
+        ]))
+        flow.append(saliency_table)
+        flow.append(Spacer(1, 24))
+
+    # ---------- AI Diagnostic Results ----------
+    flow.append(Paragraph("AI DIAGNOSTIC RESULTS", section_title_style))
+    flow.append(Spacer(1, 12))
+
+    diag_table_data = [
+        ["Classification Result", f"{class_label}"],
+        ["Confidence Level", f"{confidence_pct:.2f}%"],
+        ["Risk Assessment", f"{risk_text}"]
+    ]
+    diag_table = Table(diag_table_data, colWidths=[160, 360])
+    diag_table.setStyle(TableStyle([
+        ("VALIGN", (0,0), (-1,-1), "MIDDLE"),
+        ("INNERGRID", (0,0), (-1,-1), 0.25, colors.grey),
+        ("BOX", (0,0), (-1,-1), 0.5, colors.grey),
+        ("BACKGROUND", (0,0), (0,-1), colors.HexColor("#f3f4f6")),
+    ]))
+    flow.append(diag_table)
+    flow.append(Spacer(1, 24))
+
+    # ---------- Detailed Medical Info ----------
+    flow.append(Paragraph("DETAILED MEDICAL INFORMATION", section_title_style))
+    flow.append(Spacer(1, 12))
+
+    _append_tumor_info(flow, class_label, normal_style)
+
+    flow.append(PageBreak())  # start next big section on new page
+
+    _append_reference_and_disclaimers(flow, ts, section_title_style, subtitle_style, normal_style)
+
     # ---------- Build PDF ----------
     doc = SimpleDocTemplate(pdf_path, pagesize=letter,
                             rightMargin=36, leftMargin=36,
                             topMargin=36, bottomMargin=36)
-    try:
-        doc.build(flow)
-    finally:
-        for fpath in tmp_files:
+    doc.build(flow)
+
+    logger.info("Report %s: %d bytes, built in %.3fs (images: %s)", report_id,
+                os.path.getsize(pdf_path), time.perf_counter() - build_start, image_options)
+    return pdf_path
+
+
+# ---------- Series (multi-slice) report ----------
+@profiled("generate_series_report")
+def generate_series_report(slices, model_version=None, image_options=None, report_id=None):
+    """One PDF for a whole upload series.
+
+    ``slices`` is a list of dicts with ``name``, ``class_label``,
+    ``confidence``, ``image``, ``segmented_img`` and optionally
+    ``segmentation_note``, in the order they should be listed.
+    """
+    build_start = time.perf_counter()
+    image_options = image_options or REPORT_IMAGE_OPTIONS
+    now = datetime.now()
+    ts = now.strftime("%B %d, %Y at %H:%M:%S")
+    report_id = report_id or new_report_id(now)
+    model_version = model_version or "TumorX v2.1.0"
+
+    out_name = f"TumorX_Series_Report_{now.strftime('%Y%m%d_%H%M%S')}.pdf"
+    pdf_path = os.path.join(os.getcwd(), out_name)
+
+    title_style, subtitle_style, section_title_style, normal_style = _styles()
+    flow = []
+
+    _append_header(flow, "AI-Powered Brain Tumor Series Analysis", ts, model_version,
+                   report_id, image_options, title_style, subtitle_style)
+
+    # ---------- Series Summary ----------
+    flow.append(Paragraph("SERIES SUMMARY", section_title_style))
+    flow.append(Spacer(1, 12))
+
+    counts = {}
+    for s in slices:
+        counts[s["class_label"]] = counts.get(s["class_label"], 0) + 1
+    summary_data = [["Slices Analyzed", str(len(slices))]]
+    for label, n in sorted(counts.items(), key=lambda kv: -kv[1]):
+        top = max(float(s["confidence"]) for s in slices if s["class_label"] == label)
+        summary_data.append([f"{label}", f"{n} slice(s), highest confidence {top * 100:.2f}%"])
+    summary_table = Table(summary_data, colWidths=[160, 360])
+    summary_table.setStyle(TableStyle([
+        ("VALIGN", (0,0), (-1,-1), "MIDDLE"),
+        ("INNERGRID", (0,0), (-1,-1), 0.25, colors.grey),
+        ("BOX", (0,0), (-1,-1), 0.5, colors.grey),
+        ("BACKGROUND", (0,0), (0,-1), colors.HexColor("#f3f4f6")),
+    ]))
+    flow.append(summary_table)
+    flow.append(Spacer(1, 24))
+
+    # ---------- Per-slice Results ----------
+    flow.append(Paragraph("PER-SLICE RESULTS", section_title_style))
+    flow.append(Spacer(1, 12))
+
+    rows = []
+    for s in slices:
+        cells = []
+        for img, missing in ((s["image"], "Original not available"),
+                             (s["segmented_img"], s.get("segmentation_note") or "Segmentation not available")):
             try:
-                if os.path.exists(fpath):
-                    os.remove(fpath)
+                stream = _pil_or_array_to_stream(img, 120, 120, image_options)
             except Exception:
-                pass
+                stream = None
+            cells.append(RLImage(stream, width=120, height=120) if stream is not None
+                         else Paragraph(escape(missing), normal_style))
+        confidence_pct = float(s["confidence"]) * 100
+        cells.append(Paragraph(
+            # File names are user input; Paragraph parses its text as markup
+            f"<b>{escape(s['name'])}</b><br/>{s['class_label']} — {confidence_pct:.2f}%<br/>"
+            f"{_risk_assessment(s['class_label'], confidence_pct)}",
+            normal_style
+        ))
+        rows.append(cells)
+    slice_table = Table(rows, colWidths=[130, 130, 260])
+    slice_table.setStyle(TableStyle([
+        ("VALIGN", (0,0), (-1,-1), "MIDDLE"),
+        ("ALIGN", (0,0), (1,-1), "CENTER"),
+        ("INNERGRID", (0,0), (-1,-1), 0.25, colors.lightgrey),
+        ("BOX", (0,0), (-1,-1), 0.5, colors.lightgrey),
+    ]))
+    flow.append(slice_table)
+
+    # ---------- Detailed Medical Info (each detected class once) ----------
+    flow.append(PageBreak())
+    flow.append(Paragraph("DETAILED MEDICAL INFORMATION", section_title_style))
+    flow.append(Spacer(1, 12))
+    for label in counts:
+        _append_tumor_info(flow, label, normal_style)
+        flow.append(Spacer(1, 12))
+
+    flow.append(PageBreak())
+
+    _append_reference_and_disclaimers(flow, ts, section_title_style, subtitle_style, normal_style)
+
+    doc = SimpleDocTemplate(pdf_path, pagesize=letter,
+                            rightMargin=36, leftMargin=36,
+                            topMargin=36, bottomMargin=36)
+    doc.build(flow)
 
+    logger.info("Series report %s: %d slices, %d bytes, built in %.3fs", report_id, len(slices),
+                os.path.getsize(pdf_path), time.perf_counter() - build_start)
     return pdf_path
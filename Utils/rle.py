@@ -0,0 +1,109 @@
+import numpy as np
+
+# COCO-style run-length encoding for binary masks.
+# Runs are taken over the column-major (Fortran order) flattened mask and
+# always start with a run of zeros, so a mask beginning with 1 gets a
+# leading 0 count. Compatible with pycocotools' uncompressed/compressed RLE.
+
+
+def _as_binary_2d(mask):
+    mask = np.asarray(mask)
+    if mask.ndim == 3 and mask.shape[-1] == 1:
+        mask = mask[..., 0]
+    if mask.ndim != 2:
+        raise ValueError(f"Expected a 2D mask, got shape {mask.shape}.")
+    return mask > 0
+
+
+# ---------------- Encode ----------------
+def rle_encode(mask):
+    mask = _as_binary_2d(mask)
+    h, w = mask.shape
+    flat = mask.ravel(order="F")
+    if flat.size == 0:
+        return {"size": [h, w], "counts": []}
+
+    # Indices where the value changes, bracketed by start and end
+    change = np.flatnonzero(flat[1:] != flat[:-1]) + 1
+    bounds = np.concatenate(([0], change, [flat.size]))
+    counts = np.diff(bounds)
+    if flat[0]:
+        counts = np.concatenate(([0], counts))
+    return {"size": [h, w], "counts": counts.astype(np.int64).tolist()}
+
+
+# ---------------- Decode ----------------
+def rle_decode(rle):
+    h, w = rle["size"]
+    counts = rle["counts"]
+    if isinstance(counts, (str, bytes)):
+        counts = _string_to_counts(counts)
+    counts = np.asarray(counts, dtype=np.int64)
+    if counts.sum() != h * w:
+        raise ValueError("RLE counts do not match mask size.")
+    values = np.arange(counts.size, dtype=np.uint8) & 1
+    flat = np.repeat(values, counts)
+    return flat.reshape((h, w), order="F")
+
+
+def rle_area(rle):
+    counts = rle["counts"]
+    if isinstance(counts, (str, bytes)):
+        counts = _string_to_counts(counts)
+    return int(np.sum(np.asarray(counts, dtype=np.int64)[1::2]))
+
+
+# ---------------- Compressed string form ----------------
+def rle_compress(rle):
+    """Return a copy of ``rle`` with counts packed into the COCO string form."""
+    counts = rle["counts"]
+    if isinstance(counts, (str, bytes)):
+        return dict(rle)
+    return {"size": list(rle["size"]), "counts": _counts_to_string(counts)}
+
+
+def rle_decompress(rle):
+    counts = rle["counts"]
+    if not isinstance(counts, (str, bytes)):
+        return dict(rle)
+    return {"size": list(rle["size"]), "counts": _string_to_counts(counts)}
+
+
+def _counts_to_string(counts):
+    out = []
+    counts = [int(c) for c in counts]
+    for i, x in enumerate(counts):
+        if i > 2:
+            x -= counts[i - 2]
+        more = True
+        while more:
+            c = x & 0x1F
+            x >>= 5
+            more = (x != -1) if (c & 0x10) else (x != 0)
+            if more:
+                c |= 0x20
+            out.append(chr(c + 48))
+    return "".join(out)
+
+
+def _string_to_counts(s):
+    if isinstance(s, bytes):
+        s = s.decode("ascii")
+    counts = []
+    p = 0
+    while p < len(s):
+        x = 0
+        k = 0
+        more = True
+        while more:
+            c = ord(s[p]) - 48
+            x |= (c & 0x1F) << (5 * k)
+            more = c & 0x20
+            p += 1
+            k += 1
+            if not more and (c & 0x10):
+                x |= -1 << (5 * k)
+        if len(counts) > 2:
+            x += counts[-2]
+        counts.append(x)
+    return counts
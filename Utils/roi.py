@@ -0,0 +1,119 @@
+import cv2
+import numpy as np
+
+from Utils.segment import IMG_SIZE, render_overlay
+from Utils.profiling import profiled
+
+# Coarse-to-fine ROI segmentation.
+# Pass 1 runs the U-Net on the whole frame downscaled to its input size
+# (target_size, IMG_SIZE by default) to find candidate lesion regions.
+# Pass 2 re-runs it at the upload's native resolution, as a single batch,
+# only on input-sized windows covering those regions. The final mask is
+# the upsampled coarse probability map with the fine predictions pasted
+# over the windows. segment_tiled() is the
+# full-frame native-resolution reference it is benchmarked against.
+
+
+def _to_gray(pil_image):
+    return np.asarray(pil_image.convert("L"), dtype=np.float32) / 255.0
+
+
+def _pad_to_tile(gray, tile):
+    h, w = gray.shape
+    ph, pw = max(0, tile[0] - h), max(0, tile[1] - w)
+    if ph or pw:
+        gray = np.pad(gray, ((0, ph), (0, pw)))
+    return gray
+
+
+def _origins(start, stop, length, tile, stride):
+    """Window origins covering [start, stop) on an axis of ``length``."""
+    stop = max(stop, start + 1)
+    origins = list(range(start, max(stop - tile, start) + 1, stride))
+    if origins[-1] + tile < stop:
+        origins.append(stop - tile)
+    return [min(max(o, 0), length - tile) for o in origins]
+
+
+def _predict_windows(model, gray, windows, tile, batch_size):
+    """Run the U-Net on ``windows`` (y, x origins) as one batch; returns (prob_sum, count)."""
+    th, tw = tile
+    crops = np.stack([gray[y:y + th, x:x + tw] for y, x in windows])[..., None]
+    # predict_on_batch skips predict()'s per-call setup (~100 ms), which would
+    # dominate when only a few windows run
+    preds = np.concatenate([model.predict_on_batch(crops[i:i + batch_size])
+                            for i in range(0, len(crops), batch_size)])[..., 0]
+    prob_sum = np.zeros(gray.shape, dtype=np.float32)
+    count = np.zeros(gray.shape, dtype=np.float32)
+    for (y, x), p in zip(windows, preds):
+        prob_sum[y:y + th, x:x + tw] += p
+        count[y:y + th, x:x + tw] += 1
+    return prob_sum, count
+
+
+# ---------------- Full tiled reference ----------------
+def segment_tiled(model, pil_image, overlap=32, threshold=0.5, batch_size=16, target_size=IMG_SIZE):
+    """Native-resolution mask from overlapping tiles over the whole frame."""
+    gray = _to_gray(pil_image)
+    h, w = gray.shape
+    th, tw = target_size
+    padded = _pad_to_tile(gray, target_size)
+    ph, pw = padded.shape
+    windows = [(y, x) for y in _origins(0, ph, ph, th, th - overlap)
+               for x in _origins(0, pw, pw, tw, tw - overlap)]
+    prob_sum, count = _predict_windows(model, padded, windows, target_size, batch_size)
+    prob = prob_sum / np.maximum(count, 1)
+    return (prob[:h, :w] > threshold).astype(np.uint8)
+
+
+# ---------------- Coarse-to-fine ----------------
+def find_rois(coarse_prob, threshold=0.3, min_area=4):
+    """Bounding boxes (x, y, w, h) of connected regions in a coarse probability map."""
+    binary = (coarse_prob > threshold).astype(np.uint8)
+    n, _, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+    return [tuple(int(v) for v in stats[i, :4]) for i in range(1, n)
+            if stats[i, cv2.CC_STAT_AREA] >= min_area]
+
+
+def segment_coarse_to_fine(model, pil_image, threshold=0.5, roi_threshold=0.3,
+                           margin=0.15, min_area=4, overlap=32, batch_size=16, target_size=IMG_SIZE):
+    """Native-resolution mask; returns (mask, info) where info counts ROIs and windows."""
+    gray = _to_gray(pil_image)
+    h, w = gray.shape
+    th, tw = target_size
+
+    # Pass 1: whole frame at the U-Net's input size, resized from the gray
+    # array above (bilinear, half-pixel centres, as preprocess_image_pil)
+    small = cv2.resize(gray, (tw, th), interpolation=cv2.INTER_LINEAR)
+    coarse = np.asarray(model.predict_on_batch(small[None, ..., None]))[0, ..., 0]
+    prob = cv2.resize(coarse, (w, h), interpolation=cv2.INTER_LINEAR)
+    rois = find_rois(coarse, roi_threshold, min_area)
+
+    # Pass 2: native-resolution windows around each ROI, batched together
+    padded = _pad_to_tile(gray, target_size)
+    ph, pw = padded.shape
+    sy, sx = h / coarse.shape[0], w / coarse.shape[1]
+    windows = set()
+    for x, y, bw, bh in rois:
+        my, mx = int(bh * sy * margin), int(bw * sx * margin)
+        y0, y1 = max(0, int(y * sy) - my), min(ph, int((y + bh) * sy) + my)
+        x0, x1 = max(0, int(x * sx) - mx), min(pw, int((x + bw) * sx) + mx)
+        windows.update((oy, ox) for oy in _origins(y0, y1, ph, th, th - overlap)
+                       for ox in _origins(x0, x1, pw, tw, tw - overlap))
+
+    if windows:
+        prob_sum, count = _predict_windows(model, padded, sorted(windows), target_size, batch_size)
+        fine = prob_sum[:h, :w] / np.maximum(count[:h, :w], 1)
+        covered = count[:h, :w] > 0
+        prob = np.where(covered, fine, prob)
+
+    mask = (prob > threshold).astype(np.uint8)
+    return mask, {"rois": len(rois), "windows": len(windows)}
+
+
+@profiled("segment_image_roi")
+def segment_image_roi(model, pil_image, return_mask=False, target_size=IMG_SIZE):
+    """Coarse-to-fine counterpart of segment_image: overlay rendered at native resolution."""
+    mask, _ = segment_coarse_to_fine(model, pil_image, target_size=target_size)
+    overlay = render_overlay(_to_gray(pil_image)[..., None], mask)
+    return (overlay, mask) if return_mask else overlay
@@ -3,7 +3,12 @@ import numpy as np
 from PIL import Image
 import io
 import matplotlib.pyplot as plt
+from Utils.rle import rle_encode
+from Utils.profiling import profiled
+from Utils.graph_preprocess import CUSTOM_OBJECTS, predict_raw
 
+# Default U-Net input (height, width); registered versions carry their own
+# input_shape, passed in as target_size
 IMG_HEIGHT = 256
 IMG_WIDTH = 256
 IMG_SIZE = (IMG_HEIGHT, IMG_WIDTH)
@@ -12,46 +17,62 @@ IMG_SIZE = (IMG_HEIGHT, IMG_WIDTH)
 def bce_dice_loss(y_true, y_pred):
     return tf.keras.losses.binary_crossentropy(y_true, y_pred)
 
-def dice_coef(y_true, y_pred):
-    return 1.0
+def dice_coef(y_true, y_pred, smooth=1.0):
+    y_true = tf.cast(y_true, tf.float32)
+    y_pred = tf.cast(y_pred, tf.float32)
+    intersection = tf.reduce_sum(y_true * y_pred)
+    return (2.0 * intersection + smooth) / (tf.reduce_sum(y_true) + tf.reduce_sum(y_pred) + smooth)
 
-def iou_score(y_true, y_pred):
-    return 1.0
+def iou_score(y_true, y_pred, smooth=1.0):
+    y_true = tf.cast(y_true, tf.float32)
+    y_pred = tf.cast(y_pred, tf.float32)
+    intersection = tf.reduce_sum(y_true * y_pred)
+    union = tf.reduce_sum(y_true) + tf.reduce_sum(y_pred) - intersection
+    return (intersection + smooth) / (union + smooth)
 
 # ---------------- Load Model ----------------
-def load_segmentation_model(model_path):
+def load_segmentation_model(model_path, inference_only=False):
+    # inference_only skips compile state (loss, metrics, optimizer slots)
     model = tf.keras.models.load_model(
         model_path,
         custom_objects={"bce_dice_loss": bce_dice_loss,
                         "dice_coef": dice_coef,
-                        "iou_score": iou_score}
+                        "iou_score": iou_score,
+                        **CUSTOM_OBJECTS},
+        compile=not inference_only
     )
     return model
 
 # ---------------- Preprocess Image ----------------
-def preprocess_image_pil(pil_image):
+def preprocess_image_pil(pil_image, target_size=IMG_SIZE):
     img_bytes = io.BytesIO()
     pil_image.save(img_bytes, format="PNG")
     img_bytes = img_bytes.getvalue()
 
     img = tf.image.decode_image(img_bytes, channels=1, expand_animations=False)
     img = tf.image.convert_image_dtype(img, tf.float32)
-    img = tf.image.resize(img, IMG_SIZE, method="bilinear")
+    img = tf.image.resize(img, target_size, method="bilinear")
     return img
 
 # ---------------- Segmentation Prediction ----------------
-def segment_image(model, pil_image):
-    img = preprocess_image_pil(pil_image)
+def predict_mask(model, pil_image, threshold=0.5, target_size=IMG_SIZE):
+    img = preprocess_image_pil(pil_image, target_size)
     img_in = tf.expand_dims(img, 0)
 
-    # Predict
     pred = model.predict(img_in, verbose=0)[0]   # (H,W,1)
-    pred_bin = (pred[...,0] > 0.5).astype(np.float32)
+    mask = (pred[..., 0] > threshold).astype(np.uint8)
+    return img, mask
 
+def overlay_background(pil_image, size):
+    """Grayscale (H, W, 1) background for render_overlay, resized straight from the image."""
+    gray = pil_image.convert("L").resize(tuple(size)[::-1], Image.BILINEAR)
+    return np.asarray(gray, dtype=np.float32)[..., None] / 255.0
+
+def render_overlay(img, mask):
     # Create transparent red overlay
-    overlay = np.zeros((IMG_HEIGHT, IMG_WIDTH, 4))
+    overlay = np.zeros((*mask.shape, 4))
     overlay[..., 0] = 1.0             # red channel
-    overlay[..., 3] = pred_bin * 0.4  # alpha where mask=1
+    overlay[..., 3] = mask * 0.4      # alpha where mask=1
 
     # ----- Reproduce matplotlib layering -----
     fig, ax = plt.subplots(figsize=(6,6))
@@ -65,3 +86,37 @@ def segment_image(model, pil_image):
     plt.close(fig)
     buf.seek(0)
     return Image.open(buf)
+
+@profiled("segment_image")
+def segment_image(model, pil_image, return_mask=False, target_size=IMG_SIZE):
+    img, mask = predict_mask(model, pil_image, target_size=target_size)
+    overlay = render_overlay(img, mask)
+    return (overlay, mask) if return_mask else overlay
+
+# ---------------- Batch Segmentation ----------------
+def predict_masks(model, pil_images, threshold=0.5, in_graph=False, target_size=IMG_SIZE):
+    if in_graph:
+        preds = predict_raw(model, pil_images)
+        # Overlay background only; the model did its own preprocessing
+        imgs = np.stack([overlay_background(im, target_size) for im in pil_images])
+    else:
+        imgs = tf.stack([preprocess_image_pil(im, target_size) for im in pil_images])
+        preds = model.predict(imgs, verbose=0)
+        imgs = imgs.numpy()
+    masks = (preds[..., 0] > threshold).astype(np.uint8)
+    return imgs, masks
+
+@profiled("segment_images")
+def segment_images(model, pil_images, threshold=0.5, in_graph=False, target_size=IMG_SIZE):
+    """One forward pass for all images; returns [(overlay, mask), ...]."""
+    imgs, masks = predict_masks(model, pil_images, threshold, in_graph, target_size)
+    return [(render_overlay(img, mask), mask) for img, mask in zip(imgs, masks)]
+
+def segment_batch(model, pil_images, batch_size=16, threshold=0.5, target_size=IMG_SIZE):
+    """Segment many images; masks are returned as COCO RLE dicts."""
+    results = []
+    for start in range(0, len(pil_images), batch_size):
+        _, masks = predict_masks(model, pil_images[start:start + batch_size], threshold,
+                                 target_size=target_size)
+        results.extend(rle_encode(m) for m in masks)
+    return results
@@ -0,0 +1,166 @@
+import atexit
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from Utils.registry import ModelRegistry, KINDS
+from Utils.graph_preprocess import is_in_graph
+from Utils.gradcam import forward_with_cam
+from Utils.workers import memory_usage
+
+logger = logging.getLogger(__name__)
+
+
+# ---------------- Warm-up ----------------
+# predict() runs its inputs through in steps of at most PREDICT_STEP samples.
+# Its step function is retraced for every new input shape until a second
+# one has been seen; the next trace relaxes the dimensions that differed to
+# None and later shapes reuse it. Warming up the real batch sizes (and, for
+# raw-input models, a second image size) leaves only that relaxed trace.
+PREDICT_STEP = 32
+
+
+def warmup_batch_sizes(max_batch, views=1):
+    """predict() step sizes for analysis batches of up to ``max_batch`` images x ``views`` (TTA)."""
+    return tuple(sorted({1, min(max_batch, PREDICT_STEP), min(max_batch * views, PREDICT_STEP)}))
+
+
+def warm_up(model, input_shapes, dtype=np.float32):
+    """Run dummy inference so graph tracing happens before the first real scan."""
+    for shape in input_shapes:
+        model.predict(np.zeros(shape, dtype=dtype), verbose=0)
+
+
+def warm_up_cam(model, input_shapes, dtype=np.float32, in_graph=False):
+    """Build the Grad-CAM model and run its tape path once per shape (classifier hot path)."""
+    for shape in input_shapes:
+        forward_with_cam(model, np.zeros(shape, dtype=dtype), in_graph)
+
+
+# ---------------- Model Server ----------------
+class ModelServer:
+    """Loads the default model versions concurrently in the background and warms them up.
+
+    Models come from a ModelRegistry; other versions load lazily (and are
+    warmed up) the first time a request asks for them. Classifiers are also
+    warmed through forward_with_cam at ``gradcam_batches`` (empty when
+    Grad-CAM is off). ``ready`` flips to
+    True once the defaults are loaded. If ``ready_file`` (or
+    ``$TUMORX_READY_FILE``) is set, that file is created at the same moment
+    so external health checks can probe it. A stale file from an earlier
+    process is removed on start(), and the file is removed again if loading
+    fails and at interpreter exit.
+    """
+
+    def __init__(self, registry, warmup_batches=(1,), ready_file=None, gradcam_batches=()):
+        self.registry = registry
+        self.registry.on_load = self._warm
+        self.warmup_batches = tuple(warmup_batches)
+        self.gradcam_batches = tuple(gradcam_batches)
+        self.ready_file = ready_file or os.environ.get("TUMORX_READY_FILE")
+        self.error = None
+        self.timings = {}
+        self._ready = threading.Event()
+        self._done = threading.Event()
+        self._thread = None
+
+    @classmethod
+    def from_dir(cls, model_dir, inference_only=True, memory_budget_mb=2048, **kwargs):
+        registry = ModelRegistry.from_dir(model_dir, inference_only=inference_only,
+                                          memory_budget_mb=memory_budget_mb)
+        return cls(registry, **kwargs)
+
+    def start(self):
+        if self._thread is None:
+            if self.ready_file:
+                self._clear_ready_file()
+                atexit.register(self._clear_ready_file)
+            self._thread = threading.Thread(target=self._run, name="tumorx-model-loader", daemon=True)
+            self._thread.start()
+        return self
+
+    def _clear_ready_file(self):
+        try:
+            os.remove(self.ready_file)
+        except FileNotFoundError:
+            pass
+
+    @property
+    def ready(self):
+        return self._ready.is_set()
+
+    @property
+    def failed(self):
+        return self.error is not None
+
+    def wait(self, timeout=None):
+        self._done.wait(timeout)
+        return self.ready
+
+    def get(self, kind, version=None):
+        """Return (model, spec) for ``kind`` at ``version`` (default version if None)."""
+        return self.registry.get(kind, version)
+
+    @property
+    def cls_model(self):
+        return self.registry.get("classifier")[0]
+
+    @property
+    def seg_model(self):
+        return self.registry.get("segmenter")[0]
+
+    def status(self):
+        return {
+            "ready": self.ready,
+            "error": None if self.error is None else repr(self.error),
+            "defaults": dict(self.registry.defaults),
+            "loaded": {f"{k} {v}": f"{n / 1024 / 1024:.1f} MB"
+                       for (k, v), n in self.registry.loaded().items()},
+            "timings": dict(self.timings),
+            "memory": memory_usage(),
+        }
+
+    def _warm(self, spec, model):
+        start = time.perf_counter()
+        if is_in_graph(spec):
+            # Raw uploads arrive at any size; one batch at a second size relaxes H and W too
+            h, w = spec.input_shape[:2]
+            shapes = [(bs, h, w, 3) for bs in self.warmup_batches]
+            shapes.append((self.warmup_batches[-1], h + h // 2, w + w // 2, 3))
+            warm_up(model, shapes, dtype=np.uint8)
+            cam_shapes, dtype = [(bs, h, w, 3) for bs in self.gradcam_batches], np.uint8
+        else:
+            warm_up(model, [(bs, *spec.input_shape) for bs in self.warmup_batches])
+            cam_shapes, dtype = [(bs, *spec.input_shape) for bs in self.gradcam_batches], np.float32
+        if spec.kind == "classifier" and cam_shapes:
+            cam_start = time.perf_counter()
+            warm_up_cam(model, cam_shapes, dtype, in_graph=is_in_graph(spec))
+            self.timings[f"warmup_cam_{spec.kind}_{spec.version}_s"] = time.perf_counter() - cam_start
+        self.timings[f"warmup_{spec.kind}_{spec.version}_s"] = time.perf_counter() - start
+
+    def _run(self):
+        start = time.perf_counter()
+        try:
+            with ThreadPoolExecutor(max_workers=len(KINDS), thread_name_prefix="tumorx-load") as pool:
+                futures = [pool.submit(self.registry.get, kind) for kind in KINDS]
+                for fut in futures:
+                    fut.result()
+            for (kind, version), secs in self.registry.load_times.items():
+                self.timings[f"load_{kind}_{version}_s"] = secs
+            self.timings["total_s"] = time.perf_counter() - start
+            self._ready.set()
+            if self.ready_file:
+                with open(self.ready_file, "w") as f:
+                    f.write("ready\n")
+            logger.info("TumorX models ready: %s", self.timings)
+        except Exception as e:
+            self.error = e
+            logger.exception("TumorX model loading failed")
+            if self.ready_file:
+                self._clear_ready_file()
+        finally:
+            self._done.set()
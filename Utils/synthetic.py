@@ -0,0 +1,97 @@
+import io
+import os
+
+import numpy as np
+from PIL import Image
+
+from Utils.classification import class_names, IMG_SIZE as CLS_IMG_SIZE
+from Utils.segment import IMG_SIZE as SEG_IMG_SIZE
+
+# Synthetic stand-ins for load tests and benchmarks.
+# The models have the same input/output signatures as the real classifier
+# and U-Net but only a handful of weights, so they load in well under a
+# second and need no training data. The classifier is random; the U-Net has
+# fixed weights that find the lesion of synthetic_scan(): a smoothed
+# brightness band above brain tissue, suppressed near the brighter skull
+# ring, so its masks match synthetic_lesion_mask() at any resolution.
+
+CLS_MODEL_FILE = "brain_tumor_model.keras"
+SEG_MODEL_FILE = "final_model.keras"
+
+
+# ---------------- Models ----------------
+def build_synthetic_models(out_dir, seed=0):
+    """Save tiny classifier/U-Net stand-ins to ``out_dir``; returns their paths."""
+    import tensorflow as tf
+
+    tf.keras.utils.set_random_seed(seed)
+    os.makedirs(out_dir, exist_ok=True)
+
+    cls_in = tf.keras.Input(shape=(*CLS_IMG_SIZE, 3))
+    x = tf.keras.layers.Conv2D(8, 3, strides=4, activation="relu")(cls_in)
+    x = tf.keras.layers.GlobalAveragePooling2D()(x)
+    cls_out = tf.keras.layers.Dense(len(class_names), activation="softmax")(x)
+    cls_model = tf.keras.Model(cls_in, cls_out)
+    cls_model.compile(optimizer="adam", loss="categorical_crossentropy")
+
+    seg_in = tf.keras.Input(shape=(*SEG_IMG_SIZE, 1))
+    y = tf.keras.layers.AveragePooling2D(3, strides=1, padding="same")(seg_in)
+    # relu(x - 0.6): lesion and ring; relu(x - 0.9): ring core only
+    bands = tf.keras.layers.Conv2D(2, 1, activation="relu")
+    y = bands(y)
+    ring = tf.keras.layers.MaxPooling2D(9, strides=1, padding="same")(y)
+    head = tf.keras.layers.Conv2D(1, 1, activation="sigmoid")
+    seg_out = head(tf.keras.layers.Concatenate()([y, ring]))
+    seg_model = tf.keras.Model(seg_in, seg_out)
+    bands.set_weights([np.ones((1, 1, 1, 2), np.float32), np.array([-0.6, -0.9], np.float32)])
+    head.set_weights([np.array([40.0, 0.0, 0.0, -400.0], np.float32).reshape(1, 1, 4, 1),
+                      np.array([-2.0], np.float32)])
+    seg_model.compile(optimizer="adam", loss="binary_crossentropy")
+
+    cls_path = os.path.join(out_dir, CLS_MODEL_FILE)
+    seg_path = os.path.join(out_dir, SEG_MODEL_FILE)
+    cls_model.save(cls_path)
+    seg_model.save(seg_path)
+    return cls_path, seg_path
+
+
+# ---------------- Images ----------------
+# Lesion pixels as the stand-in U-Net sees them: added intensity above 0.2
+LESION_LEVEL = 0.2
+
+
+def _grid(size):
+    yy, xx = np.mgrid[:size, :size] / size - 0.5
+    return yy, xx
+
+
+def _lesion(rng, yy, xx):
+    cy, cx = rng.uniform(-0.2, 0.2, 2)
+    return 0.4 * np.exp(-(((yy - cy) ** 2 + (xx - cx) ** 2) / (2 * rng.uniform(0.02, 0.06) ** 2)))
+
+
+def synthetic_scan(size=512, seed=0):
+    """Grayscale MRI-like slice (RGB PIL image): bright skull ring, soft tissue, one lesion."""
+    rng = np.random.default_rng(seed)
+    yy, xx = _grid(size)
+    r = np.sqrt(yy ** 2 + (xx * 0.85) ** 2)
+    img = np.where(r < 0.42, 0.45, 0.0) + np.where((r > 0.40) & (r < 0.45), 0.5, 0.0)
+    img += _lesion(rng, yy, xx)
+    img += rng.normal(0, 0.03, img.shape)
+    img = (np.clip(img, 0, 1) * 255).astype(np.uint8)
+    return Image.fromarray(img).convert("RGB")
+
+
+def synthetic_lesion_mask(size=512, seed=0):
+    """Ground-truth lesion mask (uint8) of synthetic_scan(size, seed)."""
+    rng = np.random.default_rng(seed)
+    return (_lesion(rng, *_grid(size)) > LESION_LEVEL).astype(np.uint8)
+
+
+def encode_image(pil_image, format="JPEG", quality=92):
+    buf = io.BytesIO()
+    if format.upper() == "JPEG":
+        pil_image.save(buf, format="JPEG", quality=quality)
+    else:
+        pil_image.save(buf, format=format)
+    return buf.getvalue()
@@ -0,0 +1,175 @@
+import os
+
+import numpy as np
+
+from Utils.classification import preprocess_image_pil as cls_preprocess, class_names, IMG_SIZE as CLS_IMG_SIZE
+from Utils.segment import preprocess_image_pil as seg_preprocess, render_overlay, overlay_background, \
+    IMG_SIZE as SEG_IMG_SIZE
+from Utils.graph_preprocess import uint8_batches
+from Utils.profiling import profiled
+
+# Test-time augmentation.
+# All augmented views of all images are stacked into one batch and run in a
+# single forward pass (one per distinct image size for in-graph models).
+# Classifier probabilities are averaged over views; U-Net probability maps
+# are mapped back to the original frame (un-flipped, un-shifted) and
+# averaged where each view actually saw the pixel. How well the views agree
+# is reported as an uncertainty signal.
+#
+#   TUMORX_TTA        off | auto | always (default: auto)
+#   TUMORX_TTA_BAND   "low,high" classifier confidence band for auto (default: 0.4,0.8)
+
+# (name, horizontal flip, shift as a fraction of (height, width))
+VIEWS = (
+    ("identity", False, (0.0, 0.0)),
+    ("hflip", True, (0.0, 0.0)),
+    ("shift+", False, (0.04, 0.04)),
+    ("shift-", False, (-0.04, -0.04)),
+    ("hflip+shift", True, (0.04, -0.04)),
+)
+
+
+class TTAPolicy:
+    def __init__(self, mode="auto", low=0.4, high=0.8):
+        self.mode = mode
+        self.low = low
+        self.high = high
+
+    @classmethod
+    def from_env(cls):
+        low, high = (float(v) for v in os.environ.get("TUMORX_TTA_BAND", "0.4,0.8").split(","))
+        return cls(mode=os.environ.get("TUMORX_TTA", "auto").lower(), low=low, high=high)
+
+    def applies(self, confidence):
+        if self.mode == "always":
+            return True
+        return self.mode == "auto" and self.low <= confidence <= self.high
+
+
+# ---------------- Views ----------------
+def _shift(batch, dy, dx):
+    """Shift (N, H, W, C) by whole pixels, zero-filling what moves in."""
+    out = np.zeros_like(batch)
+    h, w = batch.shape[1:3]
+    src_y, dst_y = slice(max(0, -dy), h - max(0, dy)), slice(max(0, dy), h - max(0, -dy))
+    src_x, dst_x = slice(max(0, -dx), w - max(0, dx)), slice(max(0, dx), w - max(0, -dx))
+    out[:, dst_y, dst_x] = batch[:, src_y, src_x]
+    return out
+
+
+def _pixels(frac, size):
+    return int(round(frac[0] * size[0])), int(round(frac[1] * size[1]))
+
+
+def augment(batch, view):
+    _, flip, frac = view
+    out = batch[:, :, ::-1] if flip else batch
+    dy, dx = _pixels(frac, batch.shape[1:3])
+    return _shift(out, dy, dx) if (dy or dx) else np.ascontiguousarray(out)
+
+
+def invert(maps, view):
+    """Map (N, H, W, C) predictions of an augmented view back; returns (maps, valid)."""
+    _, flip, frac = view
+    dy, dx = _pixels(frac, maps.shape[1:3])
+    valid = np.ones_like(maps)
+    if dy or dx:
+        maps, valid = _shift(maps, -dy, -dx), _shift(valid, -dy, -dx)
+    if flip:
+        maps, valid = maps[:, :, ::-1], valid[:, :, ::-1]
+    return maps, valid
+
+
+def _input_groups(pil_images, preprocess, in_graph):
+    if in_graph:
+        yield from uint8_batches(pil_images)
+    else:
+        yield list(range(len(pil_images))), np.stack([preprocess(im) for im in pil_images])
+
+
+def _predict_views(model, batch, views):
+    """One forward pass over every view of every image; returns (V, N, ...)."""
+    stacked = np.concatenate([augment(batch, v) for v in views])
+    preds = model.predict(stacked, verbose=0)
+    return preds.reshape(len(views), len(batch), *preds.shape[1:])
+
+
+# ---------------- Classifier ----------------
+@profiled("classify_tta")
+def classify_tta(model, pil_images, labels=None, target_size=CLS_IMG_SIZE, in_graph=False,
+                 base_probs=None, views=VIEWS):
+    """TTA classification; returns [(label, confidence, probs, info), ...].
+
+    ``base_probs`` (N, classes) are identity-view outputs the caller already
+    has; the identity view is then not run again.
+    """
+    labels = labels or class_names
+    run_views = [v for v in views if base_probs is None or v[0] != "identity"]
+    view_probs = np.zeros((len(run_views), len(pil_images), len(labels)), dtype=np.float32)
+    for indices, batch in _input_groups(pil_images, lambda im: cls_preprocess(im, target_size)[0], in_graph):
+        view_probs[:, indices] = _predict_views(model, batch, run_views)
+    if base_probs is not None:
+        view_probs = np.concatenate([np.asarray(base_probs, dtype=np.float32)[None], view_probs])
+
+    mean = view_probs.mean(axis=0)
+    results = []
+    for i, row in enumerate(mean):
+        idx = int(np.argmax(row))
+        votes = view_probs[:, i].argmax(axis=-1)
+        info = {
+            "views": len(view_probs),
+            "agreement": float(np.mean(votes == idx)),
+            "confidence_std": float(view_probs[:, i, idx].std()),
+        }
+        probs = {name: float(p) for name, p in zip(labels, row)}
+        results.append((labels[idx], float(row[idx]), probs, info))
+    return results
+
+
+# ---------------- Segmentation ----------------
+@profiled("segment_tta")
+def segment_tta(model, pil_images, threshold=0.5, in_graph=False, views=VIEWS, target_size=SEG_IMG_SIZE):
+    """TTA segmentation; returns [(overlay, mask, info), ...]."""
+    h, w = target_size
+    prob_sum = np.zeros((len(pil_images), h, w, 1), dtype=np.float32)
+    weight = np.zeros_like(prob_sum)
+    view_masks = np.zeros((len(views), len(pil_images), h, w), dtype=bool)
+    view_valid = np.zeros_like(view_masks)
+    backgrounds = np.zeros_like(prob_sum)
+    for indices, batch in _input_groups(pil_images, lambda im: seg_preprocess(im, target_size).numpy(), in_graph):
+        if not in_graph:
+            backgrounds[indices] = batch
+        preds = _predict_views(model, batch, views)
+        for v, view in enumerate(views):
+            maps, valid = invert(preds[v], view)
+            prob_sum[indices] += maps * valid
+            weight[indices] += valid
+            view_masks[v, indices] = maps[..., 0] > threshold
+            view_valid[v, indices] = valid[..., 0] > 0
+    prob = prob_sum / np.maximum(weight, 1e-6)
+    masks = (prob[..., 0] > threshold).astype(np.uint8)
+
+    results = []
+    for i, mask in enumerate(masks):
+        final = mask.astype(bool)
+        dices = []
+        for v in range(len(views)):
+            valid = view_valid[v, i]
+            a, b = view_masks[v, i] & valid, final & valid
+            total = a.sum() + b.sum()
+            dices.append(1.0 if total == 0 else 2.0 * np.logical_and(a, b).sum() / total)
+        union = view_masks[:, i].any(axis=0)
+        split = union & ~view_masks[:, i].all(axis=0)
+        info = {
+            "views": len(views),
+            "agreement": float(np.mean(dices)),
+            "disputed_fraction": float(split.sum() / union.sum()) if union.any() else 0.0,
+        }
+        if in_graph:
+            # Overlay background only; the model did its own preprocessing
+            backgrounds[i] = overlay_background(pil_images[i], (h, w))
+        results.append((render_overlay(backgrounds[i], mask), mask, info))
+    return results
+
+
+policy = TTAPolicy.from_env()
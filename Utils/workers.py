@@ -0,0 +1,123 @@
+import argparse
+import json
+import multiprocessing as mp
+import os
+import resource
+from concurrent.futures import ThreadPoolExecutor
+
+from Utils.classification import load_classification_model, classify_image, IMG_SIZE as CLS_IMG_SIZE
+from Utils.segment import load_segmentation_model, segment_batch, IMG_SIZE as SEG_IMG_SIZE
+from Utils.ingest import open_image
+
+# Batch workers.
+# In "threads" mode one process loads both models once and a thread pool
+# runs the analyses against them, so every worker uses the same weights
+# (TensorFlow releases the GIL inside ops). This is also how the Streamlit
+# server shares one model copy between sessions. Forking after the models
+# are loaded is not an option: load_model already runs eager ops, which
+# start TensorFlow's thread pools, and those do not survive fork().
+# In "spawn" mode every worker process loads its own private copy, which is
+# what separate Streamlit replicas do today.
+
+_MODELS = {}
+_DECODE_SIDE = max(*CLS_IMG_SIZE, *SEG_IMG_SIZE)
+
+
+# ---------------- Memory ----------------
+def memory_usage():
+    """Resident memory of this process in MB.
+
+    ``pss_mb`` splits shared pages between the processes that map them, so
+    summing it across workers gives the real node footprint. Falls back to
+    peak RSS from getrusage where /proc is unavailable.
+    """
+    fields = {}
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 3 and parts[-1] == "kB":
+                    fields[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    except OSError:
+        peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return {"pid": os.getpid(), "rss_mb": peak_kb / 1024}
+    return {
+        "pid": os.getpid(),
+        "rss_mb": fields.get("Rss", 0.0),
+        "pss_mb": fields.get("Pss", 0.0),
+        "shared_mb": fields.get("Shared_Clean", 0.0) + fields.get("Shared_Dirty", 0.0),
+        "private_mb": fields.get("Private_Clean", 0.0) + fields.get("Private_Dirty", 0.0),
+    }
+
+
+# ---------------- Worker setup ----------------
+def preload_models(cls_path, seg_path, inference_only=True):
+    _MODELS["cls"] = load_classification_model(cls_path, inference_only)
+    _MODELS["seg"] = load_segmentation_model(seg_path, inference_only)
+
+
+def _analyze(path):
+    with open(path, "rb") as f:
+        image = open_image(f, max_side=_DECODE_SIDE)
+    label, confidence = classify_image(_MODELS["cls"], image)
+    mask_rle = segment_batch(_MODELS["seg"], [image])[0]
+    return {
+        "path": path,
+        "label": label,
+        "confidence": confidence,
+        "mask_rle": mask_rle,
+        "memory": memory_usage(),
+    }
+
+
+# ---------------- Batch run ----------------
+def run_batch(paths, cls_path, seg_path, workers=2, mode="threads", inference_only=True):
+    """Analyze ``paths`` with a worker pool; returns (results, per-process memory)."""
+    if mode == "threads":
+        preload_models(cls_path, seg_path, inference_only)
+        # First image runs alone so predict() is traced before threads share it
+        results = [_analyze(paths[0])] if paths else []
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tumorx-worker") as pool:
+            results += pool.map(_analyze, paths[1:])
+    elif mode == "spawn":
+        ctx = mp.get_context("spawn")
+        with ctx.Pool(workers, initializer=preload_models,
+                      initargs=(cls_path, seg_path, inference_only)) as pool:
+            results = pool.map(_analyze, paths, chunksize=1)
+    else:
+        raise ValueError(f"Unknown worker mode: {mode}")
+
+    # Keep the last (highest) reading per worker process; thread workers are the parent
+    memory = {"parent": memory_usage()}
+    for r in results:
+        m = r.pop("memory")
+        if m["pid"] != os.getpid():
+            memory[m["pid"]] = m
+    return results, memory
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="TumorX batch analysis workers")
+    parser.add_argument("images", nargs="+")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--mode", choices=["threads", "spawn"], default="threads")
+    parser.add_argument("--compile", action="store_true",
+                        help="load full compile/training state instead of inference-only")
+    parser.add_argument("--cls-model", default="models/brain_tumor_model.keras")
+    parser.add_argument("--seg-model", default="models/final_model.keras")
+    args = parser.parse_args(argv)
+
+    results, memory = run_batch(args.images, args.cls_model, args.seg_model,
+                                workers=args.workers, mode=args.mode,
+                                inference_only=not args.compile)
+    for r in results:
+        print(json.dumps(r))
+
+    print(f"# memory ({args.mode}, {'compiled' if args.compile else 'inference-only'})")
+    for pid, m in memory.items():
+        extra = "".join(f"  {k}={v:.1f}" for k, v in m.items() if k.endswith("_mb") and k != "rss_mb")
+        print(f"#   {str(pid):>8}  rss_mb={m['rss_mb']:.1f}{extra}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,28 +1,48 @@
 import streamlit as st
 from PIL import Image
-from Utils.classification import load_classification_model, classify_image
-from Utils.segment import load_segmentation_model, segment_image
-from Utils.report import generate_pdf_report
-import base64
+from Utils.classification import classify_batch, IMG_SIZE as CLS_IMG_SIZE
+from Utils.segment import segment_images, render_overlay, overlay_background, IMG_SIZE as SEG_IMG_SIZE
+from Utils.roi import segment_image_roi
+from Utils.report import generate_pdf_report, generate_series_report, new_report_id, scan_image_side
+from Utils.ingest import open_image
+from Utils.events import log_event, new_event_id
+from Utils.serving import ModelServer, warmup_batch_sizes
+from Utils import profiling
+from Utils import cascade
+from Utils import admission
+from Utils import tta
+from Utils.assets import register_assets, OUT_DIR as ASSET_OUT_DIR
+from Utils.graph_preprocess import is_in_graph, unwrap
+from Utils.gradcam import overlay_cam
+from Utils.phash import phash_batch, pixel_signature, signature_diff, compress_signature, decompress_signature, \
+    PHashIndex
+from Utils.rle import rle_encode, rle_decode, rle_compress
+import numpy as np
+import os
+import time
+import hashlib
+import html
 
 # -----------------------------
 # Page Config with Logo/Favicon
 # -----------------------------
-
-def get_base64_encoded_image(image_path):
-    """Convert image to base64 for favicon"""
+@st.cache_resource(show_spinner=False)
+def load_assets():
+    # Hashed CSS/fonts/favicon are built once per process and cached by the
+    # browser; reruns only re-send a <link> tag
+    urls = register_assets()
     try:
-        with open(image_path, "rb") as img_file:
-            return base64.b64encode(img_file.read()).decode()
-    except:
-        return None
+        favicon = Image.open(os.path.join(ASSET_OUT_DIR, os.path.basename(urls["favicon.ico"])))
+        favicon.load()
+    except Exception:
+        favicon = None
+    return urls, favicon
 
-# Load favicon if available
-favicon_b64 = get_base64_encoded_image("favicon.ico")
+asset_urls, favicon = load_assets()
 
 st.set_page_config(
     page_title="TumorX - Brain Tumor AI Analysis",
-    page_icon=f"data:image/png;base64,{favicon_b64}" if favicon_b64 else "🧠",
+    page_icon=favicon if favicon is not None else "🧠",
     layout="wide",
     initial_sidebar_state="collapsed"
 )
@@ -30,511 +50,136 @@ st.set_page_config(
 # -----------------------------
 # Load Models Once
 # -----------------------------
+MODEL_DIR = os.environ.get("TUMORX_MODEL_DIR", "models")
+MODEL_MEMORY_BUDGET_MB = int(os.environ.get("TUMORX_MODEL_MEMORY_MB", "2048"))
+# "full": one 256x256 pass; "roi": coarse pass + native-resolution crops around lesions
+SEGMENTATION_MODE = os.environ.get("TUMORX_SEGMENTATION_MODE", "full")
+# Slices of a multi-file upload go through the models this many at a time;
+# the gallery updates after each batch
+ANALYSIS_BATCH = int(os.environ.get("TUMORX_ANALYSIS_BATCH", "8"))
+# Grad-CAM heatmaps come out of the classifier's own forward pass (one extra
+# backward pass, no extra inference); TUMORX_GRADCAM=0 turns them off
+GRADCAM_ENABLED = os.environ.get("TUMORX_GRADCAM", "1") != "0"
+
 @st.cache_resource
 def load_models():
-    cls_model = load_classification_model("models/brain_tumor_model.keras")
-    seg_model = load_segmentation_model("models/final_model.keras")
-    return cls_model, seg_model
+    # Default classifier and U-Net versions load and warm up concurrently in
+    # the background; other registered versions load on first use. Warm-up
+    # covers single scans, full analysis batches and TTA view stacks, and the
+    # Grad-CAM pass the classifier runs on analysis batches.
+    return ModelServer.from_dir(MODEL_DIR, memory_budget_mb=MODEL_MEMORY_BUDGET_MB,
+                                warmup_batches=warmup_batch_sizes(ANALYSIS_BATCH, len(tta.VIEWS)),
+                                gradcam_batches=(1, ANALYSIS_BATCH) if GRADCAM_ENABLED else ()).start()
+
+model_server = load_models()
+
+# Near-duplicate reuse: re-exported / recompressed / resized copies of a scan
+# reuse the stored label, probabilities and mask. A perceptual-hash match
+# only nominates candidates; the same file hash or a matching 64x64 pixel
+# signature confirms them (see Utils/phash.py for the measured distances).
+# Overlays and Grad-CAM are always rendered from the current upload. The
+# index is shared by all sessions and holds only compact results: scalars,
+# the RLE mask, a uint8 CAM and the compressed signature, about 3.5-5 KB per
+# scan, so the default 1 GB cap holds 200k-300k scans.
+PHASH_ENABLED = os.environ.get("TUMORX_PHASH", "1") != "0"
+PHASH_THRESHOLD = int(os.environ.get("TUMORX_PHASH_THRESHOLD", "8"))
+PHASH_PIXEL_TOLERANCE = int(os.environ.get("TUMORX_PHASH_PIXEL_TOL", "12"))
+PHASH_MAX_MB = float(os.environ.get("TUMORX_PHASH_MAX_MB", "1024"))
+# Measured (tracemalloc) per-entry cost of the dicts, strings and array
+# headers on top of the byte fields
+PHASH_ENTRY_OVERHEAD = 1536
 
-cls_model, seg_model = load_models()
+@st.cache_resource
+def load_phash_index():
+    return PHashIndex(max_distance=PHASH_THRESHOLD, max_bytes=int(PHASH_MAX_MB * 2**20))
+
+phash_index = load_phash_index() if PHASH_ENABLED else None
+
+def find_duplicate(s, versions):
+    for distance, payload in phash_index.query(s["phash"]):
+        if payload["model_versions"] != versions:
+            continue
+        if (payload["image_sha256"] == s["image_sha256"]
+                or signature_diff(decompress_signature(payload["signature"]), s["signature"])
+                <= PHASH_PIXEL_TOLERANCE):
+            return distance, payload
+    return None, None
+
+def index_entry(s, versions):
+    """Compact index payload for an analyzed slice; returns (payload, nbytes)."""
+    mask_rle = None if s["mask"] is None else rle_compress(rle_encode(s["mask"]))
+    cam = None if s["cam"] is None else np.uint8(np.clip(s["cam"], 0, 1) * 255)
+    signature = compress_signature(s["signature"])
+    payload = {"analysis_id": s["analysis_id"], "model_versions": versions,
+               "image_sha256": s["image_sha256"], "signature": signature,
+               "mask_rle": mask_rle, "cam": cam, **{k: s[k] for k in REUSED_FIELDS}}
+    nbytes = (PHASH_ENTRY_OVERHEAD + len(signature)
+              + (0 if mask_rle is None else len(mask_rle["counts"])) + (0 if cam is None else cam.nbytes))
+    return payload, nbytes
+
+# Largest resolution any on-screen consumer needs; JPEG uploads are
+# DCT-decoded straight to about this size. Reports reuse it (see report_image).
+DISPLAY_SIDE = 640
+DECODE_SIDE = max(DISPLAY_SIDE, *CLS_IMG_SIZE, *SEG_IMG_SIZE)
+if SEGMENTATION_MODE == "roi":
+    DECODE_SIDE = None  # fine pass works at native resolution
+
+THUMB_SIDE = 256
+GALLERY_COLUMNS = 4
 
 # -----------------------------
-# Enhanced Custom CSS with Dark Theme
+# Admin: on-demand profiling
 # -----------------------------
-st.markdown(
-    """
-    <style>
-    @import url('https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700;800;900&family=Orbitron:wght@400;500;600;700;800;900&display=swap');
-
-    * {
-        margin: 0;
-        padding: 0;
-        box-sizing: border-box;
-    }
-
-    /* Remove top spacing */
-    .stApp > div:first-child,
-    .main .block-container,
-    section.main > div,
-    .element-container:first-child {
-        margin-top: 0 !important;
-        padding-top: 0 !important;
-    }
-
-    .stApp {
-        font-family: 'Inter', sans-serif;
-        background: linear-gradient(135deg, #0a0a0a 0%, #1a1a1a 50%, #000000 100%);
-        background-attachment: fixed;
-        min-height: 100vh;
-        color: #ffffff;
-        padding-top: 0 !important;
-        margin-top: 0 !important;
-        position: relative;
-        overflow-x: hidden;
-    }
-
-    /* Animated background particles */
-    .stApp::before {
-        content: '';
-        position: fixed;
-        top: 0;
-        left: 0;
-        width: 100%;
-        height: 100%;
-        background-image: 
-            radial-gradient(circle at 20% 50%, rgba(99, 102, 241, 0.08) 0%, transparent 50%),
-            radial-gradient(circle at 80% 20%, rgba(139, 92, 246, 0.08) 0%, transparent 50%),
-            radial-gradient(circle at 40% 80%, rgba(59, 130, 246, 0.08) 0%, transparent 50%);
-        animation: floatingParticles 20s ease-in-out infinite;
-        pointer-events: none;
-        z-index: -1;
-    }
-
-    @keyframes floatingParticles {
-        0%, 100% { transform: translateX(0) translateY(0); }
-        25% { transform: translateX(-20px) translateY(-10px); }
-        50% { transform: translateX(20px) translateY(-20px); }
-        75% { transform: translateX(-10px) translateY(10px); }
-    }
-
-    /* Interactive Logo Header */
-    .logo-header {
-        text-align: center;
-        padding: 2rem 0;
-        margin-bottom: 2rem;
-        position: relative;
-        overflow: hidden;
-        animation: slideDown 1.5s ease-out;
-    }
-
-    .logo-header::before {
-        content: '';
-        position: absolute;
-        top: 50%;
-        left: 50%;
-        transform: translateX(-50%) translateY(-50%);
-        width: 200px;
-        height: 200px;
-        background: conic-gradient(
-            from 0deg,
-            rgba(99, 102, 241, 0.1) 0deg,
-            rgba(139, 92, 246, 0.15) 60deg,
-            rgba(59, 130, 246, 0.1) 120deg,
-            rgba(99, 102, 241, 0.05) 180deg,
-            rgba(139, 92, 246, 0.1) 240deg,
-            rgba(99, 102, 241, 0.15) 300deg,
-            rgba(99, 102, 241, 0.1) 360deg
-        );
-        border-radius: 50%;
-        z-index: 0;
-        animation: rotate 8s linear infinite, breathe 4s ease-in-out infinite alternate;
-    }
-
-    @keyframes rotate {
-        from { transform: translateX(-50%) translateY(-50%) rotate(0deg); }
-        to { transform: translateX(-50%) translateY(-50%) rotate(360deg); }
-    }
-
-    @keyframes breathe {
-        from { scale: 1; opacity: 0.4; }
-        to { scale: 1.2; opacity: 0.7; }
-    }
-
-    @keyframes slideDown {
-        from { transform: translateY(-50px); opacity: 0; }
-        to { transform: translateY(0); opacity: 1; }
-    }
-
-    .logo-container {
-        position: relative;
-        z-index: 1;
-        cursor: pointer;
-        transition: all 0.3s ease;
-        display: inline-block;
-    }
-
-    .logo-container:hover {
-        transform: translateY(-10px) scale(1.05);
-        filter: drop-shadow(0 15px 30px rgba(99,102,241,0.5));
-    }
-
-    .logo-title {
-        font-family: 'Orbitron', monospace;
-        font-size: clamp(3rem, 8vw, 5rem);
-        font-weight: 900;
-        background: linear-gradient(135deg, #ffffff 0%, #a5b4fc 50%, #8b5cf6 100%);
-        -webkit-background-clip: text;
-        -webkit-text-fill-color: transparent;
-        background-clip: text;
-        animation: float 6s ease-in-out infinite;
-        margin: 0;
-        text-shadow: 0 0 30px rgba(99,102,241,0.3);
-    }
-
-    .logo-subtitle {
-        font-size: 1.2rem;
-        color: #94a3b8;
-        margin-top: 0.5rem;
-        font-weight: 300;
-        letter-spacing: 3px;
-        text-transform: uppercase;
-    }
-
-    @keyframes float {
-        0%, 100% { transform: translateY(0); }
-        25% { transform: translateY(-8px); }
-        50% { transform: translateY(0); }
-        75% { transform: translateY(-4px); }
-    }
-
-    /* File Upload Enhancement */
-    .upload-container {
-        max-width: 700px;
-        margin: 3rem auto;
-        animation: fadeInUp 1s ease-out 0.5s both;
-    }
-
-    .stFileUploader {
-        border: none !important;
-        background: none !important;
-    }
-
-    .stFileUploader > div {
-        border: 2px dashed rgba(99, 102, 241, 0.4) !important;
-        border-radius: 25px !important;
-        background: linear-gradient(135deg, rgba(99, 102, 241, 0.08) 0%, rgba(139, 92, 246, 0.08) 100%) !important;
-        backdrop-filter: blur(15px) !important;
-        padding: 4rem 2rem !important;
-        transition: all 0.4s ease !important;
-        position: relative !important;
-        overflow: hidden !important;
-    }
-
-    .stFileUploader > div:hover {
-        border-color: rgba(99, 102, 241, 0.7) !important;
-        background: linear-gradient(135deg, rgba(99, 102, 241, 0.15) 0%, rgba(139, 92, 246, 0.15) 100%) !important;
-        transform: translateY(-3px) !important;
-        box-shadow: 0 15px 40px rgba(99, 102, 241, 0.25) !important;
-    }
-
-    .stFileUploader label {
-        color: #e5e7eb !important;
-        font-weight: 600 !important;
-        font-size: 1.2rem !important;
-        display: flex !important;
-        flex-direction: column !important;
-        align-items: center !important;
-        gap: 1rem !important;
-        cursor: pointer !important;
-    }
-
-    .stFileUploader label::before {
-        content: "🧠";
-        font-size: 4rem;
-        margin-bottom: 1rem;
-        animation: bounce 2s infinite;
-    }
-
-    @keyframes bounce {
-        0%, 20%, 50%, 80%, 100% { transform: translateY(0); }
-        40% { transform: translateY(-15px); }
-        60% { transform: translateY(-8px); }
-    }
-
-    /* Results Container */
-    .results-container {
-        animation: fadeInUp 1s ease-out 0.8s both;
-        margin-top: 3rem;
-    }
-
-    .section-header {
-        font-size: 1.8rem;
-        font-weight: 700;
-        text-align: center;
-        margin: 2rem 0 1.5rem;
-        background: linear-gradient(135deg, #ffffff 0%, #a5b4fc 100%);
-        -webkit-background-clip: text;
-        -webkit-text-fill-color: transparent;
-        background-clip: text;
-    }
-
-    /* Image Display Cards */
-    .image-card {
-        background: linear-gradient(135deg, rgba(255,255,255,0.08) 0%, rgba(255,255,255,0.04) 100%);
-        backdrop-filter: blur(15px);
-        border: 1px solid rgba(255,255,255,0.15);
-        border-radius: 20px;
-        padding: 1.5rem;
-        transition: all 0.4s ease;
-        position: relative;
-        overflow: hidden;
-    }
-
-    .image-card:hover {
-        transform: translateY(-5px);
-        border-color: rgba(99,102,241,0.5);
-        box-shadow: 0 20px 40px rgba(0,0,0,0.3), 0 0 20px rgba(99,102,241,0.2);
-    }
-
-    .image-card::before {
-        content: '';
-        position: absolute;
-        top: 0;
-        left: 0;
-        right: 0;
-        height: 3px;
-        background: linear-gradient(90deg, #6366f1, #8b5cf6, #d946ef);
-        background-size: 200% 100%;
-        animation: gradientMove 3s linear infinite;
-    }
-
-    @keyframes gradientMove {
-        0% { background-position: 0% 50%; }
-        100% { background-position: 200% 50%; }
-    }
-
-    .image-title {
-        font-size: 1.2rem;
-        font-weight: 600;
-        color: #f8fafc;
-        text-align: center;
-        margin-bottom: 1rem;
-        background: linear-gradient(135deg, #ffffff 0%, #a5b4fc 100%);
-        -webkit-background-clip: text;
-        -webkit-text-fill-color: transparent;
-        background-clip: text;
-    }
-
-    /* Prediction Results Card */
-    .prediction-container {
-        max-width: 600px;
-        margin: 3rem auto;
-        background: linear-gradient(135deg, rgba(15, 23, 42, 0.8) 0%, rgba(30, 41, 59, 0.8) 100%);
-        backdrop-filter: blur(20px);
-        border: 2px solid rgba(99,102,241,0.3);
-        border-radius: 25px;
-        padding: 2.5rem;
-        text-align: center;
-        animation: scaleIn 0.8s ease-out, borderGlow 4s ease-in-out infinite;
-        position: relative;
-        overflow: hidden;
-    }
-
-    @keyframes scaleIn {
-        from { transform: scale(0.9); opacity: 0; }
-        to { transform: scale(1); opacity: 1; }
-    }
-
-    @keyframes borderGlow {
-        0%, 100% {
-            border-color: rgba(99,102,241,0.3);
-            box-shadow: 0 0 20px rgba(99,102,241,0.2);
-        }
-        50% {
-            border-color: rgba(99,102,241,0.6);
-            box-shadow: 0 0 30px rgba(99,102,241,0.4);
-        }
-    }
-
-    .prediction-title {
-        font-size: 1.4rem;
-        color: #d1d5db;
-        margin-bottom: 2rem;
-        font-weight: 600;
-        text-transform: uppercase;
-        letter-spacing: 2px;
-    }
-
-    .prediction-result {
-        font-size: 2.5rem;
-        font-weight: 900;
-        margin: 1.5rem 0;
-        text-shadow: 0 0 20px currentColor;
-        animation: textPulse 2s ease-in-out infinite;
-    }
-
-    @keyframes textPulse {
-        0%, 100% { transform: scale(1); }
-        50% { transform: scale(1.05); }
-    }
-
-    .confidence-score {
-        font-size: 1.5rem;
-        font-weight: 600;
-        color: #60a5fa;
-        margin: 1rem 0;
-        animation: countUp 2s ease-out;
-    }
-
-    @keyframes countUp {
-        from { opacity: 0; transform: translateY(10px); }
-        to { opacity: 1; transform: translateY(0); }
-    }
-
-    /* Generate Report Button Enhancement */
-    .report-container {
-        text-align: center;
-        margin: 3rem 0 2rem;
-        animation: fadeInUp 1s ease-out 1.5s both;
-    }
-
-    .stButton > button {
-        background: linear-gradient(135deg, #059669 0%, #10b981 50%, #34d399 100%) !important;
-        color: white !important;
-        border: none !important;
-        border-radius: 20px !important;
-        padding: 1rem 3rem !important;
-        font-size: 1.2rem !important;
-        font-weight: 700 !important;
-        font-family: 'Inter', sans-serif !important;
-        transition: all 0.4s cubic-bezier(0.4, 0, 0.2, 1) !important;
-        box-shadow: 
-            0 10px 25px rgba(16, 185, 129, 0.3),
-            inset 0 1px 0 rgba(255, 255, 255, 0.2) !important;
-        position: relative !important;
-        overflow: hidden !important;
-        text-transform: uppercase !important;
-        letter-spacing: 1px !important;
-        cursor: pointer !important;
-        min-width: 280px !important;
-        height: 60px !important;
-    }
-
-    .stButton > button::before {
-        content: '';
-        position: absolute;
-        top: 0;
-        left: -100%;
-        width: 100%;
-        height: 100%;
-        background: linear-gradient(90deg, transparent, rgba(255, 255, 255, 0.2), transparent);
-        transition: left 0.5s ease;
-    }
-
-    .stButton > button:hover::before {
-        left: 100%;
-    }
-
-    .stButton > button:hover {
-        background: linear-gradient(135deg, #047857 0%, #059669 50%, #10b981 100%) !important;
-        transform: translateY(-3px) scale(1.02) !important;
-        box-shadow: 
-            0 15px 35px rgba(16, 185, 129, 0.4),
-            0 5px 15px rgba(16, 185, 129, 0.3) !important;
-    }
-
-    /* Download Button Enhancement */
-    .stDownloadButton > button {
-        background: linear-gradient(135deg, #7c3aed 0%, #8b5cf6 50%, #a855f7 100%) !important;
-        color: white !important;
-        border: none !important;
-        border-radius: 15px !important;
-        padding: 0.8rem 2.5rem !important;
-        font-size: 1.1rem !important;
-        font-weight: 600 !important;
-        transition: all 0.3s ease !important;
-        box-shadow: 0 8px 20px rgba(124, 58, 237, 0.3) !important;
-    }
-
-    .stDownloadButton > button:hover {
-        transform: translateY(-2px) !important;
-        box-shadow: 0 12px 25px rgba(124, 58, 237, 0.4) !important;
-        background: linear-gradient(135deg, #6d28d9 0%, #7c3aed 50%, #8b5cf6 100%) !important;
-    }
-
-    /* Section spacing and animations */
-    @keyframes fadeInUp {
-        from { transform: translateY(30px); opacity: 0; }
-        to { transform: translateY(0); opacity: 1; }
-    }
-
-    /* Image enhancements */
-    .stImage img {
-        border-radius: 15px;
-        transition: all 0.3s ease;
-        box-shadow: 0 10px 25px rgba(0,0,0,0.4);
-    }
-
-    .stImage:hover img {
-        transform: scale(1.02);
-        box-shadow: 0 15px 35px rgba(0,0,0,0.5);
-    }
-
-    /* Subheader styling */
-    h3 {
-        color: #a5b4fc !important;
-        font-weight: 700 !important;
-        text-align: center !important;
-        margin: 2rem 0 1rem !important;
-        font-size: 1.6rem !important;
-        text-shadow: 0 2px 4px rgba(0,0,0,0.3) !important;
-    }
-
-    /* Text color improvements */
-    .stMarkdown p {
-        color: #e5e7eb !important;
-        font-size: 1.1rem !important;
-        line-height: 1.6 !important;
-    }
-
-    /* Success/Error message styling */
-    .stSuccess, .stError, .stWarning, .stInfo {
-        border-radius: 15px !important;
-        backdrop-filter: blur(10px) !important;
-        border: 1px solid rgba(255,255,255,0.1) !important;
-        animation: slideInLeft 0.5s ease-out !important;
-    }
-
-    @keyframes slideInLeft {
-        from { transform: translateX(-20px); opacity: 0; }
-        to { transform: translateX(0); opacity: 1; }
-    }
-
-    /* Spinner enhancement */
-    .stSpinner {
-        background: rgba(0,0,0,0.8) !important;
-        backdrop-filter: blur(10px) !important;
-        border-radius: 15px !important;
-    }
-
-    .stSpinner > div {
-        border-color: #6366f1 transparent #8b5cf6 transparent !important;
-        animation: spin 1s linear infinite, colorShift 2s ease-in-out infinite !important;
-    }
-
-    @keyframes colorShift {
-        0%, 100% { border-top-color: #6366f1; border-bottom-color: #8b5cf6; }
-        50% { border-top-color: #8b5cf6; border-bottom-color: #d946ef; }
-    }
-
-    /* Responsive adjustments */
-    @media (max-width: 768px) {
-        .logo-title {
-            font-size: 2.5rem;
-        }
-        
-        .prediction-container {
-            margin: 2rem 1rem;
-            padding: 2rem;
-        }
-        
-        .prediction-result {
-            font-size: 2rem;
-        }
+if os.environ.get("TUMORX_ADMIN") == "1":
+    with st.sidebar.expander("🛠️ Profiling", expanded=False):
+        cfg = profiling.get_config()
+        rate = st.slider("Sampled fraction of requests", 0.0, 1.0, cfg["rate"], 0.05)
+        tf_trace = st.checkbox("Record TensorFlow trace", value=cfg["tf_trace"])
+        profiling.configure(rate=rate, tf_trace=tf_trace)
+        st.caption(f"Output: {os.path.abspath(cfg['out_dir'])} (keeps {cfg['keep']})")
+        st.json(model_server.status())
+    with st.sidebar.expander("⏭️ Segmentation cascade", expanded=False):
+        cascade.policy.enabled = st.checkbox("Skip segmentation on confident scans",
+                                             value=cascade.policy.enabled)
+        cascade.policy.min_confidence = st.slider("Skip when confidence ≥", 0.5, 1.0,
+                                                  float(cascade.policy.min_confidence), 0.01)
+        st.caption(f"Skippable labels: {', '.join(cascade.policy.skip_labels)}")
+        st.json(cascade.stats.snapshot())
+    with st.sidebar.expander("🚧 Upload admission", expanded=False):
+        ap = admission.policy
+        st.caption(f"Limits: {ap.max_bytes / 2**20:.0f} MB, {ap.max_pixels / 1e6:.0f} MP "
+                   f"({ap.oversize} above), {ap.rate_limit} files / {ap.rate_window:.0f}s per session")
+        st.json(admission.stats.snapshot())
+    with st.sidebar.expander("🔁 Test-time augmentation", expanded=False):
+        modes = ["off", "auto", "always"]
+        tta.policy.mode = st.selectbox("Mode", modes, index=modes.index(tta.policy.mode))
+        tta.policy.low, tta.policy.high = st.slider("Auto band (classifier confidence)", 0.0, 1.0,
+                                                    (float(tta.policy.low), float(tta.policy.high)), 0.01)
+        st.caption(f"{len(tta.VIEWS)} views: {', '.join(v[0] for v in tta.VIEWS)}")
+    if phash_index is not None:
+        with st.sidebar.expander("♻️ Near-duplicate reuse", expanded=False):
+            st.caption(f"{len(phash_index)} indexed scans, {phash_index.nbytes / 2**20:.1f} of {PHASH_MAX_MB:.0f} MB; "
+                       f"hash threshold {phash_index.max_distance}/64 bits, "
+                       f"pixel tolerance {PHASH_PIXEL_TOLERANCE}/255")
 
-        .stButton > button {
-            min-width: 240px !important;
-            font-size: 1.1rem !important;
-            padding: 0.9rem 2.5rem !important;
-        }
-    }
+# -----------------------------
+# Model Version Selection
+# -----------------------------
+registry = model_server.registry
+model_versions = {}
+with st.sidebar.expander("🧪 Model versions", expanded=False):
+    for kind, label in (("classifier", "Classifier"), ("segmenter", "Segmentation")):
+        versions = registry.versions(kind)
+        model_versions[kind] = st.selectbox(
+            label, versions, index=versions.index(registry.defaults[kind]), key=f"version_{kind}"
+        )
 
-    /* Column spacing */
-    .stColumn {
-        padding: 0 0.75rem !important;
-    }
-    </style>
-    """,
+# -----------------------------
+# Enhanced Custom CSS with Dark Theme
+# -----------------------------
+# Theme lives in assets/theme.css and is served as a cached static file
+st.markdown(
+    f'<link rel="stylesheet" href="{asset_urls["theme.css"]}">',
     unsafe_allow_html=True
 )
 
@@ -561,39 +206,300 @@ st.markdown(
 # File Upload Section
 # -----------------------------
 st.markdown('<div class="upload-container">', unsafe_allow_html=True)
-uploaded_file = st.file_uploader(
-    "🧠 Upload MRI Scan for AI Analysis", 
+if model_server.failed:
+    st.error(f"❌ AI models failed to load: {model_server.error}")
+elif not model_server.ready:
+    st.info("⏳ AI models are warming up — uploads will be enabled in a moment.")
+uploaded_files = st.file_uploader(
+    "🧠 Upload MRI Scans for AI Analysis", 
     type=["jpg", "jpeg", "png"],
-    help="Supported formats: JPG, JPEG, PNG"
-)
+    help="Supported formats: JPG, JPEG, PNG. Select several slices to analyze a whole series.",
+    accept_multiple_files=True,
+    disabled=not model_server.ready
+) or []
 st.markdown('</div>', unsafe_allow_html=True)
 
 # -----------------------------
 # Main Analysis Section
 # -----------------------------
-if uploaded_file is not None:
-    with st.spinner('🔄 Analyzing MRI scan with advanced AI models...'):
-        # Load and process image
-        image = Image.open(uploaded_file)
-        
-        # Classification
-        class_label, confidence = classify_image(cls_model, image)
-        
-        # Segmentation
+# Results are computed once per upload and kept in session_state; the
+# results view and report panel are fragments, so report/download clicks
+# rerun only their own section instead of the whole script. Multi-file
+# uploads are analyzed in batches: one classifier and one U-Net forward
+# pass per batch.
+def upload_key(uploaded, versions):
+    file_key = getattr(uploaded, "file_id", None) or f"{uploaded.name}:{uploaded.size}"
+    return (file_key, versions["classifier"], versions["segmenter"])
+
+REUSED_FIELDS = ("class_label", "confidence", "probabilities", "seg_skipped", "tta", "gradcam_label")
+
+def decode_side(admitted, specs):
+    # Both bounds are "at least this many pixels on the short edge"; the tighter one wins.
+    # Model versions with larger inputs than the defaults raise the display bound.
+    display = DECODE_SIDE
+    if display is not None:
+        display = max(display, *(d for spec in specs for d in spec.input_shape[:2]))
+    sides = [s for s in (display, admitted.max_side) if s is not None]
+    return min(sides) if sides else None
+
+def admit_uploads(uploads, rejections):
+    """Header-only checks and the session rate limit; rejected uploads go into ``rejections``."""
+    limiter = st.session_state.get("_rate_limit")
+    if limiter is None:
+        limiter = st.session_state["_rate_limit"] = admission.RateLimit(
+            admission.policy.rate_limit, admission.policy.rate_window)
+    admitted = []
+    for uploaded in uploads:
+        a = admission.policy.inspect(uploaded)
+        if a.ok and not limiter.allow():
+            a.code = "rate"
+            a.reason = (f"more than {limiter.limit} files in {limiter.window:.0f}s; "
+                        f"retry in {limiter.retry_after():.0f}s")
+        admission.stats.record(a)
+        if a.ok:
+            admitted.append(a)
+        else:
+            rejections[upload_key(uploaded, model_versions)] = a
+            log_event("rejected", file_name=uploaded.name, file_bytes=uploaded.size,
+                      image_format=a.format, image_size=list(a.size) if a.size else None,
+                      code=a.code, reason=a.reason)
+    return admitted
+
+def analysis_failed(a, stage, error):
+    """Mark an admitted upload as failed; the caller moves it to the session's rejections."""
+    a.code, a.reason = "error", f"{stage} failed ({error})"
+    log_event("rejected", file_name=a.upload.name, file_bytes=a.upload.size, image_format=a.format,
+              image_size=list(a.size) if a.size else None, code=a.code, reason=a.reason)
+
+def analyze_batch(admitted, versions):
+    timings = {}
+    stage_start = time.perf_counter()
+
+    def lap(stage):
+        nonlocal stage_start
+        now = time.perf_counter()
+        timings[f"{stage}_ms"] = round((now - stage_start) * 1000, 2)
+        stage_start = now
+
+    cls_model, cls_spec = model_server.get("classifier", versions["classifier"])
+    seg_spec = model_server.registry.spec("segmenter", versions["segmenter"])
+    model_versions = {"classifier": cls_spec.version, "segmenter": seg_spec.version}
+    lap("model")
+
+    # Load and process images; a slice that fails to decode or classify is
+    # dropped from the batch instead of failing the whole series
+    slices = []
+    for a in admitted:
+        uploaded = a.upload
         try:
-            segmented_img = segment_image(seg_model, image)
+            image = open_image(uploaded, max_side=decode_side(a, (cls_spec, seg_spec)))
         except Exception as e:
-            st.warning(f"⚠️ Segmentation analysis unavailable: {str(e)}")
-            segmented_img = None
+            analysis_failed(a, "decoding", e)
+            continue
+        slices.append({
+            "admission": a,
+            "key": upload_key(uploaded, versions),
+            "analysis_id": new_event_id(),
+            "upload": uploaded,
+            "name": uploaded.name,
+            "image_sha256": hashlib.sha256(uploaded.getvalue()).hexdigest(),
+            "image_format": a.format,
+            "image_size": a.size,
+            "image": image,
+            "report_side": a.max_side,
+            "model_versions": model_versions,
+            "phash": None,
+            "signature": None,
+            "cam": None,
+            "seg_error": None,
+            "reuse_distance": None,
+            "reused_from": None,
+            "tta": None,
+            "gradcam_img": None,
+            "gradcam_label": None,
+            "report_pdf": None,
+        })
+    lap("decode")
+
+    # Near-duplicate lookup
+    fresh = slices
+    if phash_index is not None:
+        fresh = []
+        for s, image_hash in zip(slices, phash_batch([s["image"] for s in slices])):
+            s["phash"], s["signature"] = int(image_hash), pixel_signature(s["image"])
+            distance, duplicate = find_duplicate(s, model_versions)
+            if duplicate is None:
+                fresh.append(s)
+                continue
+            # Only results are reused; every image shown is rendered from this upload
+            s.update({k: duplicate[k] for k in REUSED_FIELDS})
+            s["reuse_distance"], s["reused_from"] = distance, duplicate["analysis_id"]
+            s["segmented_img"] = s["mask"] = None
+            if duplicate["mask_rle"] is not None:
+                s["mask"] = rle_decode(duplicate["mask_rle"])
+                s["segmented_img"] = render_overlay(overlay_background(s["image"], s["mask"].shape), s["mask"])
+            if duplicate["cam"] is not None:
+                s["gradcam_img"] = overlay_cam(s["image"], duplicate["cam"] / 255.0, max_side=DISPLAY_SIDE)
+        lap("phash")
+
+    if fresh:
+        # Classification: one forward pass for the batch
+        h, w = cls_spec.input_shape[:2]
+
+        def classify(group):
+            return classify_batch(cls_model, [s["image"] for s in group],
+                                  labels=cls_spec.class_names, target_size=(w, h),
+                                  in_graph=is_in_graph(cls_spec), return_cam=GRADCAM_ENABLED)
+
+        try:
+            predictions = list(zip(fresh, classify(fresh)))
+        except Exception:
+            # Retry slice by slice so one bad scan only fails itself
+            predictions = []
+            for s in fresh:
+                try:
+                    predictions.append((s, classify([s])[0]))
+                except Exception as e:
+                    analysis_failed(s["admission"], "classification", e)
+            fresh = [s for s, _ in predictions]
+            slices = [s for s in slices if s["admission"].ok]
+        for s, (class_label, confidence, probabilities, *cam) in predictions:
+            s.update(class_label=class_label, confidence=confidence, probabilities=probabilities,
+                     segmented_img=None, mask=None, cam=cam[0] if cam else None)
+        lap("classify")
+
+        if GRADCAM_ENABLED:
+            # Heatmap is for the plain-pass label, composited once and cached with the result
+            for s in fresh:
+                s["gradcam_img"] = overlay_cam(s["image"], s["cam"], max_side=DISPLAY_SIDE)
+                s["gradcam_label"] = s["class_label"]
+            lap("gradcam")
+
+        # Test-time augmentation for borderline confidences; the plain pass
+        # above serves as the identity view, the other views run as one batch
+        borderline = [s for s in fresh if tta.policy.applies(s["confidence"])]
+        if borderline:
+            tta_results = tta.classify_tta(
+                cls_model, [s["image"] for s in borderline], labels=cls_spec.class_names,
+                target_size=(w, h), in_graph=is_in_graph(cls_spec),
+                base_probs=[list(s["probabilities"].values()) for s in borderline],
+            )
+            for s, (class_label, confidence, probabilities, info) in zip(borderline, tta_results):
+                s.update(class_label=class_label, confidence=confidence, probabilities=probabilities,
+                         tta={"classifier": info})
+            lap("tta")
+
+        for s in fresh:
+            _, s["seg_skipped"] = cascade.policy.should_segment(s["class_label"], s["confidence"])
+
+        # Segmentation (skipped by the cascade policy on confident normal scans)
+        to_segment = [s for s in fresh if s["seg_skipped"] is None]
+        for _ in range(len(fresh) - len(to_segment)):
+            cascade.stats.record(skipped=True)
+        if to_segment:
+            try:
+                seg_start = time.perf_counter()
+                seg_model, _ = model_server.get("segmenter", seg_spec.version)
+                seg_size = seg_spec.input_shape[:2]
+                if SEGMENTATION_MODE == "roi":
+                    # ROI mode feeds its own preprocessed crops to the float-input model
+                    roi_model = unwrap(seg_model) if is_in_graph(seg_spec) else seg_model
+                    for s in to_segment:
+                        s["segmented_img"], s["mask"] = segment_image_roi(roi_model, s["image"], return_mask=True,
+                                                                          target_size=seg_size)
+                else:
+                    plain = [s for s in to_segment if s["tta"] is None]
+                    augmented = [s for s in to_segment if s["tta"] is not None]
+                    if plain:
+                        outputs = segment_images(seg_model, [s["image"] for s in plain],
+                                                 in_graph=is_in_graph(seg_spec), target_size=seg_size)
+                        for s, (segmented_img, mask) in zip(plain, outputs):
+                            s["segmented_img"], s["mask"] = segmented_img, mask
+                    if augmented:
+                        outputs = tta.segment_tta(seg_model, [s["image"] for s in augmented],
+                                                  in_graph=is_in_graph(seg_spec), target_size=seg_size)
+                        for s, (segmented_img, mask, info) in zip(augmented, outputs):
+                            s["segmented_img"], s["mask"] = segmented_img, mask
+                            s["tta"]["segmenter"] = info
+                seg_seconds = (time.perf_counter() - seg_start) / len(to_segment)
+                for s in to_segment:
+                    cascade.stats.record(skipped=False, seg_seconds=seg_seconds)
+            except Exception as e:
+                for s in to_segment:
+                    s["seg_error"] = str(e)
+        lap("segment")
+
+        if phash_index is not None:
+            for s in fresh:
+                if s["seg_error"] is None:
+                    phash_index.add(s["phash"], *index_entry(s, model_versions))
+
+    timings["total_ms"] = round(sum(timings.values()), 2)
+    for s in slices:
+        thumb = (s["segmented_img"] if s["segmented_img"] is not None else s["image"]).copy()
+        thumb.thumbnail((THUMB_SIDE, THUMB_SIDE))
+        s["thumbnail"] = thumb
+
+        mask = s["mask"]
+        mask_area = None if mask is None else {
+            "pixels": int(mask.sum()), "fraction": float(mask.mean()), "shape": list(mask.shape)
+        }
+        log_event(
+            "analysis",
+            analysis_id=s["analysis_id"],
+            image_sha256=s["image_sha256"],
+            image_format=s["image_format"],
+            image_width=s["image_size"][0],
+            image_height=s["image_size"][1],
+            downscaled=s["report_side"] is not None,
+            model_versions=model_versions,
+            label=s["class_label"],
+            confidence=s["confidence"],
+            probabilities=s["probabilities"],
+            segmentation="error" if s["seg_error"] else ("skipped" if s["seg_skipped"] else SEGMENTATION_MODE),
+            phash=None if s["phash"] is None else f"{s['phash']:016x}",
+            reused_from=s["reused_from"],
+            reuse_distance=s["reuse_distance"],
+            mask_area=mask_area,
+            tta=s["tta"],
+            gradcam=s["gradcam_img"] is not None,
+            batch_size=len(slices),
+            timings=timings,
+            report_id=None,
+        )
+    return slices
+
+def analyze_uploads(admitted, versions):
+    """Analyze admitted uploads in batches of ANALYSIS_BATCH, yielding each batch's results."""
+    for start in range(0, len(admitted), ANALYSIS_BATCH):
+        yield analyze_batch(admitted[start:start + ANALYSIS_BATCH], versions)
+
+def format_versions(versions):
+    return f"TumorX classifier v{versions['classifier']} / segmentation v{versions['segmenter']}"
+
+@st.fragment
+def results_view():
+    result = st.session_state["analysis"]
+    image, segmented_img = result["image"], result["segmented_img"]
+    class_label, confidence = result["class_label"], result["confidence"]
+
+    if result["reuse_distance"] is not None:
+        st.caption(f"♻️ Reused result from a near-duplicate scan "
+                   f"(perceptual hash distance {result['reuse_distance']}/64).")
+    if result["tta"] is not None:
+        parts = [f"classifier views agree {result['tta']['classifier']['agreement'] * 100:.0f}%"]
+        if "segmenter" in result["tta"]:
+            parts.append(f"mask agreement (Dice) {result['tta']['segmenter']['agreement'] * 100:.0f}%")
+        st.caption(f"🔁 Borderline confidence — test-time augmentation over "
+                   f"{result['tta']['classifier']['views']} views: {', '.join(parts)}.")
+    if result["seg_error"]:
+        st.warning(f"⚠️ Segmentation analysis unavailable: {result['seg_error']}")
 
-    # Results Section
-    st.markdown('<div class="results-container">', unsafe_allow_html=True)
-    
     # Display Images Side by Side
     st.markdown('<h3 class="section-header">📊 Image Analysis Results</h3>', unsafe_allow_html=True)
-    
+
     col1, col2 = st.columns(2, gap="large")
-    
+
     with col1:
         st.markdown('<div class="image-card">', unsafe_allow_html=True)
         st.markdown('<div class="image-title">🔬 Original MRI Scan</div>', unsafe_allow_html=True)
@@ -605,15 +511,24 @@ if uploaded_file is not None:
         if segmented_img is not None:
             st.markdown('<div class="image-title">🎯 AI Segmentation Analysis</div>', unsafe_allow_html=True)
             st.image(segmented_img, use_container_width=True)
+        elif result["seg_skipped"]:
+            st.markdown('<div class="image-title">⏭️ Segmentation Skipped</div>', unsafe_allow_html=True)
+            st.info(f"Segmentation was not run: {result['seg_skipped']}.")
         else:
             st.markdown('<div class="image-title">⚠️ Segmentation Unavailable</div>', unsafe_allow_html=True)
             st.info("Segmentation analysis could not be performed on this image.")
         st.markdown('</div>', unsafe_allow_html=True)
 
+    if result["gradcam_img"] is not None:
+        with st.expander("🔥 Classifier attention (Grad-CAM)", expanded=False):
+            st.image(result["gradcam_img"], use_container_width=True)
+            st.caption(f"Warmer regions most influenced the '{result['gradcam_label']}' prediction. "
+                       "This shows what the classifier relied on, not a tumor boundary.")
+
     # Classification Results
     result_color = "#ef4444" if class_label != "notumor" else "#10b981"
     result_emoji = "⚠️" if class_label != "notumor" else "✅"
-    
+
     st.markdown(
         f"""
         <div class="prediction-container">
@@ -624,6 +539,9 @@ if uploaded_file is not None:
             <div class="confidence-score">
                 Model Confidence: {confidence*100:.1f}%
             </div>
+            <div style="font-size: 0.9rem; color: #94a3b8;">
+                {format_versions(result["model_versions"])}
+            </div>
             <div style="margin-top: 2rem; padding: 1.5rem; background: rgba(0,0,0,0.3); border-radius: 15px; font-size: 1.1rem; color: #e5e7eb;">
                 <strong>{'⚠️ Consult medical professional for further evaluation' if class_label != 'notumor' else '✅ Scan appears normal - No tumor detected'}</strong>
             </div>
@@ -632,28 +550,179 @@ if uploaded_file is not None:
         unsafe_allow_html=True
     )
 
+def report_image(result):
+    """Scan for the PDF: the on-screen decode when it covers the printed size, else a bounded re-decode."""
+    side = scan_image_side()
+    image = result["image"]
+    if side is not None and (min(image.size) >= side or image.size == tuple(result["image_size"])):
+        return image
+    sides = [s for s in (side, result["report_side"]) if s is not None]
+    return open_image(result["upload"], max_side=min(sides) if sides else None)
+
+@st.fragment
+def report_panel():
+    result = st.session_state["analysis"]
+
     # Generate Report Section
     st.markdown('<div class="report-container">', unsafe_allow_html=True)
     st.markdown('<h3 class="section-header">📄 Generate Patient Report</h3>', unsafe_allow_html=True)
-    
+
     if st.button("📑 Generate PDF Report"):
         try:
-            pdf_path = generate_pdf_report(class_label, confidence, image, segmented_img)
-            
+            report_start = time.perf_counter()
+            report_id = new_report_id()
+            pdf_path = generate_pdf_report(result["class_label"], result["confidence"],
+                                           report_image(result), result["segmented_img"],
+                                           model_version=format_versions(result["model_versions"]),
+                                           segmentation_note=result["seg_skipped"],
+                                           report_id=report_id,
+                                           saliency_img=result["gradcam_img"],
+                                           saliency_label=result["gradcam_label"])
             with open(pdf_path, "rb") as f:
-                st.download_button(
-                    label="⬇️ Download Medical Report",
-                    data=f,
-                    file_name="TumorX_Medical_Report.pdf",
-                    mime="application/pdf"
-                )
+                result["report_pdf"] = f.read()
+            log_event(
+                "report",
+                analysis_id=result["analysis_id"],
+                report_id=report_id,
+                report_bytes=len(result["report_pdf"]),
+                timings={"report_ms": round((time.perf_counter() - report_start) * 1000, 2)},
+            )
             st.success("✅ Report generated successfully!")
         except Exception as e:
             st.error(f"❌ Error generating report: {str(e)}")
-    
+
+    if result["report_pdf"] is not None:
+        st.download_button(
+            label="⬇️ Download Medical Report",
+            data=result["report_pdf"],
+            file_name="TumorX_Medical_Report.pdf",
+            mime="application/pdf"
+        )
+
     st.markdown('</div>', unsafe_allow_html=True)
+
+SORT_OPTIONS = {
+    "Upload order": None,
+    "Label": lambda r: (r["class_label"], -r["confidence"]),
+    "Confidence (high → low)": lambda r: -r["confidence"],
+    "Confidence (low → high)": lambda r: r["confidence"],
+}
+
+def render_thumbnails(results, selectable=False):
+    selected = st.session_state.get("selected_slice")
+    for row_start in range(0, len(results), GALLERY_COLUMNS):
+        cols = st.columns(GALLERY_COLUMNS)
+        for col, r in zip(cols, results[row_start:row_start + GALLERY_COLUMNS]):
+            with col:
+                st.image(r["thumbnail"], use_container_width=True)
+                marker = "▶ " if r["key"] == selected else ""
+                st.caption(f"{marker}{r['name']} · {r['class_label']} {r['confidence'] * 100:.1f}%")
+                if selectable and st.button("🔍 View", key=f"view_{r['analysis_id']}"):
+                    st.session_state["selected_slice"] = r["key"]
+                    st.rerun()
+
+@st.fragment
+def gallery_view():
+    results = list(st.session_state["analyses"].values())
+    st.markdown('<h3 class="section-header">🗂️ Series Gallery</h3>', unsafe_allow_html=True)
+    order = st.selectbox("Sort slices by", list(SORT_OPTIONS), key="gallery_sort")
+    if SORT_OPTIONS[order] is not None:
+        results = sorted(results, key=SORT_OPTIONS[order])
+    render_thumbnails(results, selectable=True)
+
+@st.fragment
+def series_report_panel():
+    results = list(st.session_state["analyses"].values())
+    series_key = tuple(r["key"] for r in results)
+    report = st.session_state.get("series_report")
+
+    st.markdown('<div class="report-container">', unsafe_allow_html=True)
+    st.markdown('<h3 class="section-header">📚 Combined Series Report</h3>', unsafe_allow_html=True)
+
+    if st.button(f"📑 Generate Series Report ({len(results)} slices)"):
+        try:
+            report_start = time.perf_counter()
+            report_id = new_report_id()
+            pdf_path = generate_series_report(
+                [{"name": r["name"], "class_label": r["class_label"], "confidence": r["confidence"],
+                  "image": r["image"], "segmented_img": r["segmented_img"],
+                  "segmentation_note": r["seg_skipped"]} for r in results],
+                model_version=format_versions(results[0]["model_versions"]),
+                report_id=report_id,
+            )
+            with open(pdf_path, "rb") as f:
+                report = {"key": series_key, "pdf": f.read()}
+            st.session_state["series_report"] = report
+            log_event(
+                "report",
+                analysis_ids=[r["analysis_id"] for r in results],
+                report_id=report_id,
+                report_bytes=len(report["pdf"]),
+                timings={"report_ms": round((time.perf_counter() - report_start) * 1000, 2)},
+            )
+            st.success("✅ Series report generated successfully!")
+        except Exception as e:
+            st.error(f"❌ Error generating series report: {str(e)}")
+
+    if report is not None and report["key"] == series_key:
+        st.download_button(
+            label="⬇️ Download Series Report",
+            data=report["pdf"],
+            file_name="TumorX_Series_Report.pdf",
+            mime="application/pdf"
+        )
+
     st.markdown('</div>', unsafe_allow_html=True)
 
+if not uploaded_files:
+    for key in ("analyses", "analysis", "selected_slice", "series_report", "rejections"):
+        st.session_state.pop(key, None)
+elif model_server.ready:
+    analyses = st.session_state.setdefault("analyses", {})
+    keys = [upload_key(u, model_versions) for u in uploaded_files]
+    # Rejections are remembered per file, except rate-limited ones which are retried
+    rejections = {k: a for k, a in st.session_state.get("rejections", {}).items()
+                  if k in keys and a.code != "rate"}
+    pending = [u for u, k in zip(uploaded_files, keys) if k not in analyses and k not in rejections]
+    admitted = admit_uploads(pending, rejections) if pending else []
+    st.session_state["rejections"] = rejections
+    if admitted:
+        # Thumbnails appear as each batch completes
+        progress = st.empty()
+        with st.spinner(f'🔄 Analyzing {len(admitted)} MRI scan(s) with advanced AI models...'):
+            for batch in analyze_uploads(admitted, model_versions):
+                analyses.update((r["key"], r) for r in batch)
+                # Finished batches survive a failure or rerun later in the series
+                st.session_state["analyses"] = analyses
+                rejections.update((upload_key(a.upload, model_versions), a) for a in admitted if a.code == "error")
+                if len(uploaded_files) > 1:
+                    with progress.container():
+                        render_thumbnails([analyses[k] for k in keys if k in analyses])
+        progress.empty()
+    for k in keys:
+        if k in rejections:
+            st.error(f"🚫 {rejections[k].upload.name} was not analyzed: {rejections[k].reason}.")
+    # Drop results for files no longer in the uploader; keep upload order
+    keys = [k for k in keys if k in analyses]
+    st.session_state["analyses"] = analyses = {k: analyses[k] for k in keys}
+
+    if analyses:
+        selected = st.session_state.get("selected_slice")
+        if selected not in analyses:
+            selected = st.session_state["selected_slice"] = keys[0]
+        st.session_state["analysis"] = analyses[selected]
+
+        # Results Section
+        st.markdown('<div class="results-container">', unsafe_allow_html=True)
+        if len(analyses) > 1:
+            gallery_view()
+            series_report_panel()
+            st.markdown(f'<h3 class="section-header">🔍 Slice: {html.escape(analyses[selected]["name"])}</h3>',
+                        unsafe_allow_html=True)
+        results_view()
+        report_panel()
+        st.markdown('</div>', unsafe_allow_html=True)
+
 # -----------------------------
 # Footer Information
 # -----------------------------
@@ -684,4 +753,9 @@ st.markdown(
     </div>
     """,
     unsafe_allow_html=True
-)
\ No newline at end of file
+)
+
+# Poll until the background loader finishes, then rerun with uploads enabled
+if not model_server.ready and not model_server.failed:
+    model_server.wait(timeout=1.0)
+    st.rerun()
@@ -0,0 +1,108 @@
+import io
+import struct
+import zlib
+
+import pytest
+from PIL import Image
+
+from Utils.admission import AdmissionPolicy, RateLimit
+
+
+class _Upload(io.BytesIO):
+    def __init__(self, data, size=None):
+        super().__init__(data)
+        if size is not None:
+            self.size = size
+
+
+def _encode(width, height, format="JPEG", mode="RGB"):
+    buf = io.BytesIO()
+    Image.new(mode, (width, height)).save(buf, format=format)
+    return _Upload(buf.getvalue())
+
+
+def _chunk(kind, data):
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+
+def _png_header(width, height):
+    """PNG with an IHDR and no pixel data: enough for Image.open to read the size."""
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return _Upload(b"\x89PNG\r\n\x1a\n" + _chunk(b"IHDR", ihdr) + _chunk(b"IEND", b""))
+
+
+# ---------------- AdmissionPolicy.inspect ----------------
+def test_admits_small_jpeg_and_png():
+    policy = AdmissionPolicy()
+    for fmt in ("JPEG", "PNG"):
+        a = policy.inspect(_encode(40, 30, fmt))
+        assert a.ok and not a.downscaled
+        assert (a.format, a.size, a.mode) == (fmt, (40, 30), "RGB")
+
+
+def test_rejects_by_byte_size_before_reading_header():
+    a = AdmissionPolicy(max_bytes=1024).inspect(_Upload(b"not an image", size=2048))
+    assert a.code == "bytes" and a.format is None
+
+
+def test_byte_size_falls_back_to_buffer_length():
+    upload = _encode(64, 64, "PNG")
+    limit = len(upload.getvalue()) - 1
+    assert AdmissionPolicy(max_bytes=limit).inspect(upload).code == "bytes"
+    assert AdmissionPolicy(max_bytes=limit + 1).inspect(upload).ok
+
+
+def test_rejects_unreadable_and_unlisted_formats():
+    policy = AdmissionPolicy()
+    assert policy.inspect(_Upload(b"definitely not an image")).code == "unreadable"
+    a = policy.inspect(_encode(8, 8, "GIF", mode="P"))
+    assert a.code == "format" and a.format == "GIF"
+    assert AdmissionPolicy(formats=("PNG",)).inspect(_encode(8, 8, "JPEG")).code == "format"
+
+
+def test_rejects_decompression_bombs_from_the_header():
+    side = int((2 * Image.MAX_IMAGE_PIXELS) ** 0.5) + 1
+    assert AdmissionPolicy(max_pixels=0).inspect(_png_header(side, side)).code == "bomb"
+
+
+@pytest.mark.parametrize("max_pixels, max_side", [
+    (50_000, 150),      # 400x300 = 120000 px -> 1/2 scale (30000 px), short side 300 // 2
+    (10_000, 75),       # 1/4 scale (7500 px)
+    (2_000, 37),        # 1/8 scale (1875 px)
+])
+def test_oversized_jpeg_is_admitted_at_draft_scale(max_pixels, max_side):
+    a = AdmissionPolicy(max_pixels=max_pixels).inspect(_encode(400, 300))
+    assert a.ok and a.downscaled and a.max_side == max_side
+
+
+def test_oversized_beyond_draft_scale_or_not_jpeg_is_rejected():
+    assert AdmissionPolicy(max_pixels=1_000).inspect(_encode(400, 300)).code == "pixels"
+    assert AdmissionPolicy(max_pixels=50_000).inspect(_encode(400, 300, "PNG")).code == "pixels"
+    assert AdmissionPolicy(max_pixels=50_000, oversize="reject").inspect(_encode(400, 300)).code == "pixels"
+
+
+def test_zero_limits_disable_checks():
+    a = AdmissionPolicy(max_bytes=0, max_pixels=0).inspect(_encode(400, 300))
+    assert a.ok and not a.downscaled
+
+
+# ---------------- RateLimit ----------------
+def test_rate_limit_sliding_window():
+    limit = RateLimit(3, 10.0)
+    assert [limit.allow(now=t) for t in (0.0, 1.0, 2.0)] == [True, True, True]
+    assert not limit.allow(now=5.0)
+    assert limit.retry_after(now=5.0) == pytest.approx(5.0)
+    # The first request leaves the window at t = 10; rejected calls are not counted
+    assert limit.allow(now=10.0)
+    assert not limit.allow(now=10.5)
+    assert limit.retry_after(now=10.5) == pytest.approx(0.5)
+    assert limit.allow(now=11.0) and limit.allow(now=12.0)
+
+
+def test_rate_limit_idle_and_disabled():
+    limit = RateLimit(2, 10.0)
+    assert limit.retry_after(now=0.0) == 0.0
+    limit.allow(now=0.0)
+    assert limit.retry_after(now=1.0) == 0.0
+    off = RateLimit(0, 10.0)
+    assert all(off.allow(now=0.0) for _ in range(100))
@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from Utils.evaluate import confusion_matrix, classification_metrics, dice_iou
+from Utils.segment import dice_coef, iou_score
+
+
+def test_confusion_matrix_counts():
+    y_true = np.array([0, 0, 1, 1, 1, 2])
+    y_pred = np.array([0, 1, 1, 1, 2, 2])
+    cm = confusion_matrix(y_true, y_pred, 3)
+    assert cm.tolist() == [[1, 1, 0],
+                           [0, 2, 1],
+                           [0, 0, 1]]
+
+
+def test_classification_metrics_by_hand():
+    cm = np.array([[1, 1, 0],
+                   [0, 2, 1],
+                   [0, 0, 1]])
+    m = classification_metrics(cm, ["a", "b", "c"])
+    assert m["accuracy"] == pytest.approx(4 / 6)
+    a, b, c = (m["per_class"][k] for k in "abc")
+    # a: tp 1, predicted 1, actual 2; b: tp 2, predicted 3, actual 3; c: tp 1, predicted 2, actual 1
+    assert (a["precision"], a["recall"], a["support"]) == (pytest.approx(1.0), pytest.approx(0.5), 2)
+    assert (b["precision"], b["recall"], b["support"]) == (pytest.approx(2 / 3), pytest.approx(2 / 3), 3)
+    assert (c["precision"], c["recall"], c["support"]) == (pytest.approx(0.5), pytest.approx(1.0), 1)
+    assert a["f1"] == pytest.approx(2 / 3)
+    assert b["f1"] == pytest.approx(2 / 3)
+    assert c["f1"] == pytest.approx(2 / 3)
+
+
+def test_classification_metrics_unpredicted_class():
+    cm = np.array([[2, 0],
+                   [1, 0]])
+    m = classification_metrics(cm, ["a", "b"])
+    assert m["per_class"]["b"] == {"precision": 0.0, "recall": 0.0, "f1": 0.0, "support": 1}
+
+
+def test_dice_iou_empty_vs_empty_is_one():
+    empty = np.zeros((2, 4, 4), dtype=np.uint8)
+    dice, iou, inter, p_sum, t_sum = dice_iou(empty, empty)
+    assert dice.tolist() == [1.0, 1.0] and iou.tolist() == [1.0, 1.0]
+    assert inter.tolist() == p_sum.tolist() == t_sum.tolist() == [0, 0]
+
+
+def test_dice_iou_partial_overlap():
+    pred = np.zeros((3, 4, 4), dtype=np.uint8)
+    true = np.zeros((3, 4, 4), dtype=np.uint8)
+    pred[0, :2] = 1                 # 8 pixels
+    true[0, 1:3] = 1                # 8 pixels, 4 shared
+    pred[1, 0, 0] = 1               # prediction on an empty mask
+    true[2] = 1                     # missed entirely
+    dice, iou, inter, p_sum, t_sum = dice_iou(pred, true)
+    assert dice == pytest.approx([0.5, 0.0, 0.0])
+    assert iou == pytest.approx([1 / 3, 0.0, 0.0])
+    assert inter.tolist() == [4, 0, 0]
+    assert p_sum.tolist() == [8, 1, 0] and t_sum.tolist() == [8, 0, 16]
+
+
+def test_training_metrics_match_smoothed_formulas():
+    y_true = np.zeros((1, 4, 4, 1), dtype=np.float32)
+    y_pred = np.zeros((1, 4, 4, 1), dtype=np.float32)
+    y_true[0, :2] = 1
+    y_pred[0, 1:3] = 1
+    # intersection 4, |true| = |pred| = 8, union 12, smooth 1
+    assert float(dice_coef(y_true, y_pred)) == pytest.approx((2 * 4 + 1) / (8 + 8 + 1))
+    assert float(iou_score(y_true, y_pred)) == pytest.approx((4 + 1) / (12 + 1))
+    empty = np.zeros_like(y_true)
+    assert float(dice_coef(empty, empty)) == pytest.approx(1.0)
+    assert float(iou_score(empty, empty)) == pytest.approx(1.0)
@@ -0,0 +1,92 @@
+import numpy as np
+import pytest
+
+from Utils.phash import PHashIndex, hamming, pixel_signature, compress_signature, decompress_signature, \
+    signature_diff
+
+
+def _brute_force(stored, h, max_distance):
+    return sorted((hamming(h, s), i) for i, s in enumerate(stored) if hamming(h, s) <= max_distance)
+
+
+def _near(rng, h, distance):
+    for bit in rng.choice(64, size=distance, replace=False):
+        h ^= 1 << int(bit)
+    return h
+
+
+@pytest.mark.parametrize("max_distance", [0, 2, 4, 8, 10])
+def test_query_matches_brute_force(max_distance):
+    rng = np.random.default_rng(max_distance)
+    # Clustered hashes: neighbours of a few centres at every distance up to 12 bits
+    centres = [int(h) for h in rng.integers(0, 2 ** 64, size=8, dtype=np.uint64)]
+    stored = [_near(rng, c, int(d)) for c in centres for d in rng.integers(0, 13, size=40)]
+    index = PHashIndex(max_distance=max_distance)
+    for i, h in enumerate(stored):
+        index.add(h, i)
+    probes = centres + [_near(rng, c, 3) for c in centres]
+    probes += [int(h) for h in rng.integers(0, 2 ** 64, size=8, dtype=np.uint64)]
+    for h in probes:
+        hits = index.query(h)
+        assert sorted(hits) == _brute_force(stored, h, max_distance)
+        assert [d for d, _ in hits] == sorted(d for d, _ in hits)
+
+
+def test_query_radius_is_capped_by_index_threshold():
+    index = PHashIndex(max_distance=4)
+    index.add(0, "a")
+    index.add(0b111, "b")
+    index.add(0b111111, "c")
+    assert index.query(0) == [(0, "a"), (3, "b")]
+    assert index.query(0, max_distance=2) == [(0, "a")]
+    assert index.query(0, max_distance=20) == [(0, "a"), (3, "b")]
+
+
+def test_nearest_then_most_recent_first():
+    index = PHashIndex(max_distance=2)
+    index.add(1, "old")
+    index.add(1, "new")
+    index.add(0, "exact")
+    assert [p for _, p in index.query(0)] == ["exact", "new", "old"]
+
+
+def test_eviction_by_entries_and_bytes():
+    index = PHashIndex(max_distance=0, max_entries=3)
+    for i in range(5):
+        index.add(i, i)
+    assert len(index) == 3 and index.query(0) == [] and index.query(4) == [(0, 4)]
+
+    index = PHashIndex(max_distance=0, max_bytes=250)
+    for i in range(5):
+        index.add(i, i, nbytes=100)
+    assert len(index) == 2 and index.nbytes == 200
+    assert index.query(2) == [] and index.query(3) == [(0, 3)]
+
+
+def test_remove():
+    index = PHashIndex(max_distance=1)
+    entry = index.add(5, "x")
+    index.remove(entry)
+    assert len(index) == 0 and index.query(5) == []
+
+
+def test_signature_round_trip():
+    from PIL import Image
+
+    img = Image.fromarray(np.arange(128 * 128, dtype=np.uint32).reshape(128, 128).astype(np.uint8))
+    sig = pixel_signature(img)
+    assert len(sig) == 64 * 64
+    assert decompress_signature(compress_signature(sig)) == sig
+    other = bytearray(sig)
+    other[10] = (other[10] + 30) % 256
+    assert signature_diff(sig, sig) == 0
+    assert signature_diff(sig, bytes(other)) == 30
+
+
+def test_eviction_within_a_shared_bucket():
+    index = PHashIndex(max_distance=0, max_entries=2)
+    for name in ("a", "b", "c", "d"):
+        index.add(7, name)
+    assert index.query(7) == [(0, "d"), (0, "c")]
+    index.add(8, "e")
+    assert index.query(7) == [(0, "d")] and index.query(8) == [(0, "e")]
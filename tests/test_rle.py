@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+from Utils.rle import rle_encode, rle_decode, rle_area, rle_compress, rle_decompress
+
+
+def _round_trip(mask):
+    rle = rle_encode(mask)
+    assert np.array_equal(rle_decode(rle), mask)
+    assert np.array_equal(rle_decode(rle_compress(rle)), mask)
+    assert rle_decompress(rle_compress(rle)) == rle
+    assert rle_area(rle) == rle_area(rle_compress(rle)) == int(mask.sum())
+    return rle
+
+
+def test_empty_mask():
+    mask = np.zeros((7, 5), dtype=np.uint8)
+    assert _round_trip(mask)["counts"] == [35]
+
+
+def test_full_mask():
+    mask = np.ones((7, 5), dtype=np.uint8)
+    assert _round_trip(mask)["counts"] == [0, 35]
+
+
+def test_mask_starting_with_one():
+    mask = np.zeros((4, 4), dtype=np.uint8)
+    mask[0, 0] = 1
+    assert _round_trip(mask)["counts"] == [0, 1, 15]
+
+
+def test_column_major_order():
+    mask = np.zeros((2, 3), dtype=np.uint8)
+    mask[:, 1] = 1
+    assert _round_trip(mask)["counts"] == [2, 2, 2]
+
+
+def test_zero_size_mask():
+    rle = rle_encode(np.zeros((0, 4), dtype=np.uint8))
+    assert rle == {"size": [0, 4], "counts": []}
+    assert rle_decode(rle).shape == (0, 4)
+
+
+def test_negative_deltas():
+    # Run lengths shrink after index 2, so the string form stores negative
+    # differences and needs the sign-extension branch when decoding
+    mask = np.zeros((1, 60), dtype=np.uint8)
+    mask[0, 30:50] = 1
+    mask[0, 51] = 1
+    mask[0, 53:55] = 1
+    rle = _round_trip(mask)
+    assert rle["counts"] == [30, 20, 1, 1, 1, 2, 5]
+    # Same string pycocotools produces for these counts
+    assert rle_compress(rle)["counts"] == "n0d01]O014"
+
+
+def test_large_counts():
+    mask = np.zeros((512, 512), dtype=np.uint8)
+    mask[100:400, 200:300] = 1
+    _round_trip(mask)
+
+
+def test_random_masks():
+    rng = np.random.default_rng(0)
+    for density in (0.01, 0.5, 0.99):
+        _round_trip((rng.random((33, 17)) < density).astype(np.uint8))
+
+
+def test_channel_axis_and_bytes():
+    mask = np.zeros((6, 6, 1), dtype=np.uint8)
+    mask[2:4, 1:5] = 1
+    rle = rle_compress(rle_encode(mask))
+    rle["counts"] = rle["counts"].encode("ascii")
+    assert np.array_equal(rle_decode(rle), mask[..., 0])
+
+
+def test_rejects_bad_input():
+    with pytest.raises(ValueError):
+        rle_encode(np.zeros((2, 2, 2)))
+    with pytest.raises(ValueError):
+        rle_decode({"size": [2, 2], "counts": [1, 2]})